@@ -1,24 +1,71 @@
 import streamlit as st
-import pandas as pd
-from sklearn.neighbors import NearestNeighbors
 from datetime import datetime
-import plotly.express as px
+from uuid import uuid4
 
-# Load data
-df = pd.read_csv('modified_madurai_food_shops.csv')
-df = df.dropna()
+from foodans_core import charts, events, ingest, load_data, metrics, recommend, reload_data
 
-# Score for ranking
-df['Score'] = 0.6 * df['Avg_Rating'] + 0.4 * (df['Total_Order'] / df['Total_Order'].max())
+# Opt-in timings ($FOODANS_METRICS, see foodans_core/metrics.py); with metrics on,
+# add ?profile=1 to the URL to cProfile one full rerun
+rerun = metrics.start("rerun", top=True)
+profiler = metrics.start_profile() if metrics.enabled and st.query_params.get("profile") == "1" else None
 
-# KNN setup
-knn_data = df[['Price', 'Avg_Rating']].copy()
-knn_data['Food_Type'] = df['Food_Type'].map({'Veg': 0, 'Non-Veg': 1})
-knn = NearestNeighbors(n_neighbors=5).fit(knn_data)
+# Feedback and order clicks go to a local event store (written by a background thread)
+store = events.open_store()
+session_id = st.session_state.setdefault("session_id", uuid4().hex)
+
+# Load data (shared across sessions, rebuilt only when the CSV changes); recorded
+# orders are folded into Total_Order/Score whenever a snapshot is built, and new
+# ones every few seconds after that
+data = load_data(orders=store.order_counts)
+ingest.follow_orders(store)
+df = data.df
+index = data.index
+vendors = data.vendors
+
+# Manual reload hook for pushing new menus without a server restart
+with st.sidebar:
+    if st.button("Reload menu data 🔄"):
+        store.flush(timeout=5)
+        data = reload_data(orders=store.order_counts)
+        df, index, vendors = data.df, data.index, data.vendors
+        st.success(f"Menu reloaded ({len(df)} items, version {data.version})")
+
+
+def place_order(row, name, message, source):
+    store.order(row['Name'], row['Item_Name'], row['Area'], user=name, session=session_id, source=source)
+    # Shown by the section's next rerun (elements can't be drawn from a fragment's callbacks)
+    st.session_state["order_message"] = message
+
+
+def show_order_message():
+    message = st.session_state.pop("order_message", None)
+    if message:
+        st.toast(message)
+
+
+def order_button(key, row, name, message):
+    """An "Order Now!" button that records an order intent for menu ``row``."""
+    st.button("Order Now! 🍽️", key=key, on_click=place_order, args=(row, name, message, key))
+
+
+# Vendors offered by each vendor picker
+VENDOR_CHOICES = 20
+
+
+def vendor_picker(label, key, area):
+    """A vendor selectbox, narrowed by an optional search box above it.
+
+    Without a query (or a match) it offers the best vendors in ``area`` by
+    mean Score rather than every vendor in the city.
+    """
+    query = st.text_input("Search vendors", key=key, placeholder="Vendor, dish, category or area")
+    options = recommend.search_vendors(data, query, k=VENDOR_CHOICES) if query.strip() else []
+    if not options:
+        if query.strip():
+            st.caption(f"No vendor matches '{query}', showing the top vendors in {area}")
+        options = list(vendors.top_vendors(area, k=VENDOR_CHOICES))
+    return st.selectbox(label, options)
 
-# Debug data (optional, remove for production)
-print("Unique Types:", df['Type'].unique())
-print("Unique Areas:", df['Area'].unique())
 
 # Real-time intro about Madurai with image
 st.markdown("<h1 style='text-align: center; color: #FF69B4;'>Sha’s Foodans 🍔✨</h1>", unsafe_allow_html=True)
@@ -44,288 +91,256 @@ with col1:
     diet_type = st.selectbox("Diet Preference?", ["Both", "Veg", "Non-Veg"])  # New preference option
 with col2:
     gender = st.selectbox("What’s your gender?", ["Male", "Female", "Others"])
-    area = st.selectbox("Where are you in Madurai?", sorted(df['Area'].unique()))
-
-if st.button("Show Top Foods! 🌟"):
-    area_df = df[df['Area'] == area]
-    # Filter by diet preference
-    if diet_type == "Veg":
-        area_df = area_df[area_df['Food_Type'] == "Veg"]
-    elif diet_type == "Non-Veg":
-        area_df = area_df[area_df['Food_Type'] == "Non-Veg"]
-    top_vendors = area_df.groupby('Name')['Score'].mean().sort_values(ascending=False).head(5).index
-    st.success(f"Hi {name}! Top 5 vendors in {area} ({diet_type} options):")
-    for vendor in top_vendors:
-        vendor_df = area_df[area_df['Name'] == vendor].sort_values('Score', ascending=False).head(3)
-        st.write(f"**{vendor}**")
-        for i, row in vendor_df.iterrows():
-            st.write(f"- {row['Item_Name']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
-        st.button("Order Now! 🍽️", key=f"order_{vendor}", disabled=True)
-
-# Section 2: What’s Your Vibe?
+    area = st.selectbox("Where are you in Madurai?", index.areas)
+
+
+# Each section below is a fragment: its own widgets rerun only that section.
+# Section 1's answers are shared by all of them, so changing those reruns the page.
+@st.fragment
+@metrics.timed("section.top_foods")
+def top_foods(name, area, diet_type):
+    show_order_message()
+    if st.button("Show Top Foods! 🌟"):
+        top_vendors = recommend.top_vendors(data, area, diet_type, k=5, items=3)  # Area + diet preference, by mean Score
+        st.success(f"Hi {name}! Top 5 vendors in {area} ({diet_type} options):")
+        for vendor, vendor_df in top_vendors:
+            st.write(f"**{vendor}**")
+            for i, row in vendor_df.iterrows():
+                st.write(f"- {row['Item_Name']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
+            order_button(f"order_{vendor}", vendor_df.iloc[0], name, f"{name}, ordering from {vendor} soon!")
+
+
+top_foods(name, area, diet_type)
+
+# Quick search across dishes, vendors, categories and areas (typos are fine)
 st.markdown("---")
-st.markdown("<h2 style='color: #FF1493;'>What’s Your Vibe? 🍽️</h2>", unsafe_allow_html=True)
-col3, col4 = st.columns(2)
-with col3:
-    category = st.selectbox(f"{name}, what type?", sorted(df['Type'].unique()))
-    price_range = st.selectbox(f"{name}, how much?", ["0-50", "51-100", "101-150", "151+", "Any Price"])
-with col4:
-    rating_options = ["3.0-3.5", "3.5-4.0", "4.0-4.5", "4.5 and above"]
-    min_rating_range = st.selectbox(f"{name}, what rating?", rating_options)
+st.markdown("<h2 style='color: #FF1493;'>Search the Menu! 🔎</h2>", unsafe_allow_html=True)
+
+
+@st.fragment
+@metrics.timed("section.search_menu")
+def search_menu(name, diet_type):
+    show_order_message()
+    query = st.text_input(f"{name}, craving something? Search dishes, vendors, categories or areas",
+                          placeholder="e.g. biriyani, Ganesh Tea, Tallakulam", key="menu_search")
+    if query.strip():
+        results = recommend.search_menu(data, query, diet_type, k=10)  # Text match + Score, diet preference applied
+        if results.empty:
+            st.warning(f"No matches for '{query}' ({diet_type} options), try another spelling!")
+        else:
+            for row in results.to_dict('records'):
+                st.write(f"- {row['Item_Name']} ({row['Category']}) at {row['Name']} in {row['Area']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
+            order_button("search_order", results.iloc[0], name, f"{name}, ordering {results.iloc[0]['Item_Name']} soon!")
+
+
+search_menu(name, diet_type)
+
+
+def category_changed():
+    st.session_state["category_changed"] = True
+
+
+# Sections 2-4 share the vibe answers and the search result
+@st.fragment
+@metrics.timed("section.whats_your_vibe")
+def whats_your_vibe(name, area, diet_type):
+    show_order_message()
+    # Section 2: What’s Your Vibe?
+    st.markdown("---")
+    st.markdown("<h2 style='color: #FF1493;'>What’s Your Vibe? 🍽️</h2>", unsafe_allow_html=True)
+    col3, col4 = st.columns(2)
+    with col3:
+        category = st.selectbox(f"{name}, what type?", index.types, key="category", on_change=category_changed)
+        price_range = st.selectbox(f"{name}, how much?", list(recommend.PRICE_BANDS))
+    with col4:
+        min_rating_range = st.selectbox(f"{name}, what rating?", list(recommend.RATING_BANDS))
     
-    # Dynamic area options based on category
-    if category:
-        areas_with_category = sorted(df[df['Type'] == category]['Area'].unique())
-        if len(areas_with_category) > 0:
-            new_area = st.selectbox(f"{name}, same area or new?", ["Same"] + areas_with_category)
+        # Dynamic area options based on category
+        if category:
+            areas_with_category = index.areas_for_type(category)
+            if len(areas_with_category) > 0:
+                new_area = st.selectbox(f"{name}, same area or new?", ["Same"] + areas_with_category)
+            else:
+                new_area = st.selectbox(f"{name}, same area or new?", ["Same"] + index.areas)  # Fallback if no areas have the category
         else:
-            new_area = st.selectbox(f"{name}, same area or new?", ["Same"] + sorted(df['Area'].unique()))  # Fallback if no areas have the category
-    else:
-        new_area = st.selectbox(f"{name}, same area or new?", ["Same"] + sorted(df['Area'].unique()))
-
-if st.button("Find My Food! 😋"):
-    if price_range == "Any Price":
-        price_min, price_max = 0, float('inf')
-    else:
-        price_min, price_max = map(int, price_range.split('-')) if '-' in price_range else (151, float('inf'))
-    search_area = area if new_area == "Same" else new_area
-    if min_rating_range == "4.5 and above":
-        rating_min = 4.5
-        rating_max = float('inf')
-    else:
-        rating_min, rating_max = map(float, min_rating_range.split('-'))
-    filtered = df[(df['Area'] == search_area) & (df['Type'] == category) &  # Strict filter for category
-                  (df['Price'].between(price_min, price_max)) & 
-                  (df['Avg_Rating'].between(rating_min, rating_max))]
-    # Filter by diet preference
-    if diet_type == "Veg":
-        filtered = filtered[filtered['Food_Type'] == "Veg"]
-    elif diet_type == "Non-Veg":
-        filtered = filtered[filtered['Food_Type'] == "Non-Veg"]
+            new_area = st.selectbox(f"{name}, same area or new?", ["Same"] + index.areas)
+
+    # Section 6 lists items of the chosen type, so a new type refreshes the whole page
+    if st.session_state.pop("category_changed", False):
+        st.rerun()
+
+    if st.button("Find My Food! 😋"):
+        search_area = area if new_area == "Same" else new_area
+        # Strict filter for category, price band, rating band and diet preference
+        result = recommend.find_food(data, search_area, category, diet_type,
+                                     price=recommend.PRICE_BANDS[price_range], rating=recommend.RATING_BANDS[min_rating_range])
     
-    if filtered.empty:
-        st.error(f"Ei {name}, no {category} in {search_area} for {price_range} with {min_rating_range} stars ({diet_type} options)!")
-        category_df = df[df['Type'] == category]
-        if not category_df.empty:
-            # Filter by diet preference
-            if diet_type == "Veg":
-                category_df = category_df[category_df['Food_Type'] == "Veg"]
-            elif diet_type == "Non-Veg":
-                category_df = category_df[category_df['Food_Type'] == "Non-Veg"]
-            idx = category_df.index[0]
-            _, neighbors = knn.kneighbors([knn_data.iloc[idx]])
-            similar = df.iloc[neighbors[0]].head(2)
-            # Filter similar items by diet preference and category
-            if diet_type == "Veg":
-                similar = similar[(similar['Food_Type'] == "Veg") & (similar['Type'] == category)]
-            elif diet_type == "Non-Veg":
-                similar = similar[(similar['Food_Type'] == "Non-Veg") & (similar['Type'] == category)]
-            st.write(f"But try these {category} instead:")
+        if result.top_item is None:
+            st.error(f"Ei {name}, no {category} in {search_area} for {price_range} with {min_rating_range} stars ({diet_type} options)!")
+            if result.similar is not None:
+                # Neighbours are searched within the category + diet preference only
+                st.write(f"But try these {category} instead:")
+                for i, row in result.similar.iterrows():
+                    st.write(f"- {row['Item_Name']} at {row['Name']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
+        else:
+            st.success(f"Wiii {name}! Here’s {category} in {search_area} ({diet_type} options):")
+            for vendor, vendor_df in result.matches.groupby('Name', sort=False, observed=True):
+                st.write(f"**{vendor}**")
+                for i, row in vendor_df.iterrows():
+                    st.write(f"- {row['Item_Name']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
+            order_button("vibe_order", result.top_item, name, f"{name}, ordering top {category} item soon!")
+        
+            top_item = result.top_item
+            similar = result.similar
+            st.write(f"{name}, you might like these {category} too:")
             for i, row in similar.iterrows():
                 st.write(f"- {row['Item_Name']} at {row['Name']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
-    else:
-        st.success(f"Wiii {name}! Here’s {category} in {search_area} ({diet_type} options):")
-        vendors = filtered['Name'].unique()
-        for vendor in vendors:
-            vendor_df = filtered[filtered['Name'] == vendor].sort_values('Score', ascending=False).head(4)
-            st.write(f"**{vendor}**")
-            for i, row in vendor_df.iterrows():
-                st.write(f"- {row['Item_Name']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
-        st.button("Order Now! 🍽️", key="vibe_order", on_click=lambda: st.write(f"{name}, ordering top {category} item soon!"))
-        
-        top_item = filtered.sort_values('Score', ascending=False).iloc[0]
-        idx = filtered[filtered['Item_Name'] == top_item['Item_Name']].index[0]
-        _, neighbors = knn.kneighbors([knn_data.iloc[idx]])
-        similar = df.iloc[neighbors[0]].head(3)
-        # Filter similar items by diet preference and category
-        if diet_type == "Veg":
-            similar = similar[(similar['Food_Type'] == "Veg") & (similar['Type'] == category)]
-        elif diet_type == "Non-Veg":
-            similar = similar[(similar['Food_Type'] == "Non-Veg") & (similar['Type'] == category)]
-        st.write(f"{name}, you might like these {category} too:")
-        for i, row in similar.iterrows():
-            st.write(f"- {row['Item_Name']} at {row['Name']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
-        st.button("Order Now! 🍽️", key="similar_vibe_order", on_click=lambda: st.write(f"{name}, ordering top similar {category} item soon!"))
-
-# Section 3: More for You!
-if 'top_item' in locals():
-    st.markdown("---")
-    st.markdown("<h2 style='color: #FF1493;'>More for You! 🌈</h2>", unsafe_allow_html=True)
-    # Filter by diet preference
-    if diet_type == "Veg":
-        top_seller = df[(df['Name'] == top_item['Name']) & (df['Type'] == category) & (df['Food_Type'] == "Veg")].sort_values('Total_Order', ascending=False).iloc[0]
-    elif diet_type == "Non-Veg":
-        top_seller = df[(df['Name'] == top_item['Name']) & (df['Type'] == category) & (df['Food_Type'] == "Non-Veg")].sort_values('Total_Order', ascending=False).iloc[0]
-    else:  # Both
-        top_seller = df[(df['Name'] == top_item['Name']) & (df['Type'] == category)].sort_values('Total_Order', ascending=False).iloc[0]
-    st.write(f"{name}, top pick from {top_seller['Name']} ({diet_type} options): {top_seller['Item_Name']}, ₹{top_seller['Price']}, ⭐ {top_seller['Avg_Rating']}")
-    st.button("Order Now! 🍽️", key="more_order", on_click=lambda: st.write(f"{name}, ordering {top_seller['Item_Name']} soon!"))
-
-# Section 4: What’s Next?
-if 'category' in locals():
-    st.markdown("---")
-    st.markdown("<h2 style='color: #FF1493;'>What’s Next? ⏰</h2>", unsafe_allow_html=True)
-    next_types = {
-        "Tiffin": ["Tea", "Lunch", "Fast Food"],
-        "Fast Food": ["Tea", "Café"],
-        "Lunch": ["Café", "Tea", "Fast Food"],
-        "Tea": ["Fast Food", "Café","Lunch"],
-        "Café": ["Tea", "Tiffin","Lunch"]
-    }
-    search_area = new_area if 'new_area' in locals() else area if 'area' in locals() else df['Area'].iloc[0]
-    if category in next_types:
-        st.success(f"Hey {name}, after {category}, how about these in {search_area} ({diet_type} options)?")
-        next_options = next_types[category]
-        recommendations = []
-        for next_type in next_options:
-            # Try with search_area first
-            next_filtered = df[(df['Type'] == next_type) & (df['Area'] == search_area)].sort_values('Score', ascending=False).head(3)  # Show up to 3 items per type
-            # Filter by diet preference
-            if diet_type == "Veg":
-                next_filtered = next_filtered[next_filtered['Food_Type'] == "Veg"]
-            elif diet_type == "Non-Veg":
-                next_filtered = next_filtered[next_filtered['Food_Type'] == "Non-Veg"]
-            if not next_filtered.empty:
-                recommendations.extend(next_filtered.to_dict('records'))  # Add all 3 items if available
-            # Fallback to any area if no matches in search_area
-            elif not df[df['Type'] == next_type].empty:
-                next_fallback = df[df['Type'] == next_type].sort_values('Score', ascending=False).head(3)  # Show up to 3 items
-                # Filter by diet preference
-                if diet_type == "Veg":
-                    next_fallback = next_fallback[next_fallback['Food_Type'] == "Veg"]
-                elif diet_type == "Non-Veg":
-                    next_fallback = next_fallback[next_fallback['Food_Type'] == "Non-Veg"]
-                recommendations.extend(next_fallback.to_dict('records'))
-        
-        if recommendations:
-            unique_recommendations = []  # Avoid duplicates
-            seen_items = set()
-            for rec in recommendations[:9]:  # Limit to 9 total to ensure 3 unique items max
-                if rec['Item_Name'] not in seen_items:
-                    unique_recommendations.append(rec)
-                    seen_items.add(rec['Item_Name'])
-                    if len(unique_recommendations) == 3:  # Stop at 3 unique items
-                        break
-            for row in unique_recommendations:
-                st.write(f"- {row['Item_Name']} ({row['Type']}) at {row['Name']} in {row['Area']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
-            st.button("Order Now! 🍽️", key="next_order", on_click=lambda: st.write(f"{name}, ordering top next item soon!"))
-        else:
-            st.warning(f"No direct matches for {category} in {search_area} ({diet_type} options). Exploring nearby options...")
-            category_df = df[df['Type'] == category]
-            if not category_df.empty:
-                # Filter by diet preference
-                if diet_type == "Veg":
-                    category_df = category_df[category_df['Food_Type'] == "Veg"]
-                elif diet_type == "Non-Veg":
-                    category_df = category_df[category_df['Food_Type'] == "Non-Veg"]
-                idx = category_df.index[0]
-                # Ensure feature names match
-                query = knn_data.loc[idx].values.reshape(1, -1)
-                _, neighbors = knn.kneighbors(query)
-                similar_items = df.iloc[neighbors[0]].head(3)  # Show up to 3 similar items
-                # Filter similar items by diet preference and category
-                if diet_type == "Veg":
-                    similar_items = similar_items[(similar_items['Food_Type'] == "Veg") & (similar_items['Type'] == category)]
-                elif diet_type == "Non-Veg":
-                    similar_items = similar_items[(similar_items['Food_Type'] == "Non-Veg") & (similar_items['Type'] == category)]
-                st.write(f"Try these {category} instead:")
-                for i, row in similar_items.iterrows():
-                    st.write(f"- {row['Item_Name']} ({row['Type']}) at {row['Name']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
-                st.button("Order Now! 🍽️", key="next_similar_order", on_click=lambda: st.write(f"{name}, ordering top similar {category} item soon!"))
+            if not similar.empty:
+                order_button("similar_vibe_order", similar.iloc[0], name, f"{name}, ordering top similar {category} item soon!")
+
+    # Section 3: More for You!
+    if 'top_item' in locals():
+        st.markdown("---")
+        st.markdown("<h2 style='color: #FF1493;'>More for You! 🌈</h2>", unsafe_allow_html=True)
+        # Vendor's best seller in this category for the diet preference
+        top_seller = df.iloc[vendors.top_items(top_item['Name'], diet_type, type_=category, k=1)[0]]
+        st.write(f"{name}, top pick from {top_seller['Name']} ({diet_type} options): {top_seller['Item_Name']}, ₹{top_seller['Price']}, ⭐ {top_seller['Avg_Rating']}")
+        order_button("more_order", top_seller, name, f"{name}, ordering {top_seller['Item_Name']} soon!")
+
+    # Section 4: What’s Next?
+    if 'category' in locals():
+        st.markdown("---")
+        st.markdown("<h2 style='color: #FF1493;'>What’s Next? ⏰</h2>", unsafe_allow_html=True)
+        # Resolve "Same" to the user's own area
+        search_area = area if new_area == "Same" else new_area
+        if data.transitions.covers(category):
+            st.success(f"Hey {name}, after {category}, how about these in {search_area} ({diet_type} options)?")
+            unique_recommendations = recommend.next_meals(data, category, search_area, diet_type)  # 3 unique items max
+            if not unique_recommendations.empty:
+                for row in unique_recommendations.to_dict('records'):
+                    st.write(f"- {row['Item_Name']} ({row['Type']}) at {row['Name']} in {row['Area']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
+                order_button("next_order", unique_recommendations.iloc[0], name, f"{name}, ordering top next item soon!")
             else:
-                st.error(f"Oops, {category} isn’t in our data!")
+                st.warning(f"No direct matches for {category} in {search_area} ({diet_type} options). Exploring nearby options...")
+                similar = recommend.category_alternatives(data, category, diet_type, k=3)  # Show up to 3 similar items
+                if similar is not None:
+                    st.write(f"Try these {category} instead:")
+                    for i, row in similar.iterrows():
+                        st.write(f"- {row['Item_Name']} ({row['Type']}) at {row['Name']}, ₹{row['Price']}, ⭐ {row['Avg_Rating']}")
+                    order_button("next_similar_order", similar.iloc[0], name, f"{name}, ordering top similar {category} item soon!")
+                else:
+                    st.error(f"Oops, {category} isn’t in our data!")
+
+
+whats_your_vibe(name, area, diet_type)
 
 # Section 5: Know Your Vendors!
 st.markdown("---")
 st.markdown("<h2 style='color: #FF1493;'>Know Your Vendors! 🍴</h2>", unsafe_allow_html=True)
 
-# Area filter for vendors
-selected_area = st.selectbox(f"{name}, pick an area to explore vendors!", sorted(df['Area'].unique()))
-st.markdown(f"### Vendors in {selected_area} 🌟")
-area_df = df[df['Area'] == selected_area]
-# Filter by diet preference
-if diet_type == "Veg":
-    area_df = area_df[area_df['Food_Type'] == "Veg"]
-elif diet_type == "Non-Veg":
-    area_df = area_df[area_df['Food_Type'] == "Non-Veg"]
-if not area_df.empty:
-    vendors = area_df['Name'].unique()
-    for vendor in vendors:
-        vendor_df = area_df[area_df['Name'] == vendor]
-        avg_rating = vendor_df['Avg_Rating'].mean()
-        total_orders = vendor_df['Total_Order'].sum()
-        top_items = vendor_df.sort_values('Total_Order', ascending=False).head(5)  # Changed to top 5
-        top_item = top_items.iloc[0]
-        st.write(f"🍽️ In {selected_area}, **{vendor}** is a foodie fave with {top_item['Item_Name']} at ₹{top_item['Price']}, ⭐{top_item['Avg_Rating']} ({diet_type} options)!")
-        st.write(f"- Avg Rating: {avg_rating:.1f} ⭐ | Total Orders: {total_orders}")
-        st.write("Top 5 Dishes:")
-        table_data = [{"Item": row[1]['Item_Name'], "Price": f"₹{row[1]['Price']}", "Rating": f"⭐{row[1]['Avg_Rating']}", "Orders": row[1]['Total_Order']} for row in top_items.iterrows()]
+@st.fragment
+@metrics.timed("section.know_your_vendors")
+def know_your_vendors(name, diet_type):
+    # Area filter for vendors
+    selected_area = st.selectbox(f"{name}, pick an area to explore vendors!", index.areas)
+    st.markdown(f"### Vendors in {selected_area} 🌟")
+    area_vendors = vendors.vendors_in_area(selected_area, diet_type)  # Area + diet preference stats per vendor
+    if not area_vendors.empty:
+        for vendor, stats in zip(area_vendors.index, area_vendors.itertuples()):
+            top_items = df.iloc[vendors.top_items(vendor, diet_type, area=selected_area, k=5)]  # Changed to top 5
+            top_item = top_items.iloc[0]
+            st.write(f"🍽️ In {selected_area}, **{vendor}** is a foodie fave with {top_item['Item_Name']} at ₹{top_item['Price']}, ⭐{top_item['Avg_Rating']} ({diet_type} options)!")
+            st.write(f"- Avg Rating: {stats.avg_rating:.1f} ⭐ | Total Orders: {stats.total_orders}")
+            st.write("Top 5 Dishes:")
+            table_data = [{"Item": row['Item_Name'], "Price": f"₹{row['Price']}", "Rating": f"⭐{row['Avg_Rating']}", "Orders": row['Total_Order']} for row in top_items.to_dict('records')]
+            st.table(table_data)
+        top_area_items = df.iloc[index.top(area=selected_area, diet=diet_type, by='Total_Order', k=5)]
+        st.markdown(f"#### {selected_area} Foodie Faves! 🥰")
+        st.write(f"It seems {selected_area} people love these foods ({diet_type} options):")
+        table_data = [{"Item": row['Item_Name'], "Price": f"₹{row['Price']}", "Rating": f"⭐{row['Avg_Rating']}", "Orders": row['Total_Order']} for row in top_area_items.to_dict('records')]
         st.table(table_data)
-    top_area_items = area_df.sort_values('Total_Order', ascending=False).head(5)
-    st.markdown(f"#### {selected_area} Foodie Faves! 🥰")
-    st.write(f"It seems {selected_area} people love these foods ({diet_type} options):")
-    table_data = [{"Item": row[1]['Item_Name'], "Price": f"₹{row[1]['Price']}", "Rating": f"⭐{row[1]['Avg_Rating']}", "Orders": row[1]['Total_Order']} for row in top_area_items.iterrows()]
-    st.table(table_data)
+
+
+know_your_vendors(name, diet_type)
 
 st.markdown("---")
 st.markdown(f"### Pick a Vendor to Dive In! 🔍")
-vendor = st.selectbox(f"{name}, choose a vendor!", sorted(df['Name'].unique()))  # Show all vendors, no diet filtering
-vendor_df = df[df['Name'] == vendor]  # No diet filtering here
-if not vendor_df.empty:
-    vendor_types = vendor_df['Type'].unique()
-    vendor_areas = vendor_df['Area'].unique()
-    type_emojis = {"Tiffin": "🥐", "Fast Food": "🍔", "Tea": "🍵", "Café": "☕"}
-    emoji = "".join(type_emojis.get(t, "🍽️") for t in vendor_types)
-    st.markdown(f"#### {vendor} {emoji}")
-    st.write(f"Found in: {', '.join(vendor_areas)}")
-    st.write(f"Avg Rating: {vendor_df['Avg_Rating'].mean():.1f} ⭐ | Total Orders: {vendor_df['Total_Order'].sum()}")
-    display_df = vendor_df[vendor_df['Type'] == category] if 'category' in locals() and category in vendor_df['Type'].values else vendor_df  # No diet filtering
-    top_items = display_df.sort_values('Total_Order', ascending=False).head(7)  # Changed to top 7
-    st.write(f"Top Items{' (' + category + ')' if 'category' in locals() else ''}:")
-    for i, row in top_items.iterrows():
-        with st.expander(f"{row['Item_Name']} ({row['Type']})"):
-            st.write(f"Price: ₹{row['Price']} | Rating: ⭐ {row['Avg_Rating']} | Orders: {row['Total_Order']}")
-    st.button("Order Now! 🍽️", key="vendor_order", on_click=lambda: st.write(f"{name}, ordering top {vendor} item soon!"))
+
+
+@st.fragment
+@metrics.timed("section.pick_a_vendor")
+def pick_a_vendor(name, area):
+    show_order_message()
+    category = st.session_state.get("category")  # chosen in Section 2
+    vendor = vendor_picker(f"{name}, choose a vendor!", "pick_vendor_search", area)  # No diet filtering
+    vendor_stats = vendors.vendor(vendor)  # No diet filtering here
+    if vendor_stats is not None:
+        vendor_types = vendor_stats['types']
+        vendor_areas = vendor_stats['areas']
+        type_emojis = {"Tiffin": "🥐", "Fast Food": "🍔", "Tea": "🍵", "Café": "☕"}
+        emoji = "".join(type_emojis.get(t, "🍽️") for t in vendor_types)
+        st.markdown(f"#### {vendor} {emoji}")
+        st.write(f"Found in: {', '.join(vendor_areas)}")
+        st.write(f"Avg Rating: {vendor_stats['avg_rating']:.1f} ⭐ | Total Orders: {vendor_stats['total_orders']}")
+        display_type = category if category in vendor_types else None  # No diet filtering
+        top_items = df.iloc[vendors.top_items(vendor, type_=display_type, k=7)]  # Changed to top 7
+        st.write(f"Top Items{' (' + category + ')' if category else ''}:")
+        for i, row in top_items.iterrows():
+            with st.expander(f"{row['Item_Name']} ({row['Type']})"):
+                st.write(f"Price: ₹{row['Price']} | Rating: ⭐ {row['Avg_Rating']} | Orders: {row['Total_Order']}")
+        order_button("vendor_order", top_items.iloc[0], name, f"{name}, ordering top {vendor} item soon!")
+
+
+pick_a_vendor(name, area)
 
 # Section 7: Know Your Vendor Detailed!
 st.markdown("---")
 st.markdown("<h2 style='color: #FF1493;'>Know Your Vendor Detailed! 📊</h2>", unsafe_allow_html=True)
-vendor = st.selectbox(f"{name}, pick a vendor for a deep dive!", sorted(df['Name'].unique()))  # Show all vendors
-vendor_df = df[df['Name'] == vendor]
-# Filter by diet preference for consistency
-if diet_type == "Veg":
-    vendor_df = vendor_df[vendor_df['Food_Type'] == "Veg"]
-elif diet_type == "Non-Veg":
-    vendor_df = vendor_df[vendor_df['Food_Type'] == "Non-Veg"]
-if not vendor_df.empty:
-    with st.expander(f"🌟 Detailed Visuals for {vendor} in Madurai! 🍽️", expanded=False):
-        # Pie Chart: Dish Distribution by Total Orders
-        dish_orders = vendor_df.groupby('Item_Name')['Total_Order'].sum().reset_index()
-        fig_pie = px.pie(dish_orders, names='Item_Name', values='Total_Order', title=f"🍵 Dish Popularity at {vendor}")
-        st.plotly_chart(fig_pie, use_container_width=True)
-
-        # Bar Chart: Average Rating Distribution
-        avg_ratings = vendor_df.groupby('Item_Name')['Avg_Rating'].mean().reset_index()
-        fig_bar = px.bar(avg_ratings, x='Item_Name', y='Avg_Rating', title=f"⭐ Ratings for {vendor}'s Dishes")
-        st.plotly_chart(fig_bar, use_container_width=True)
-
-        # Histogram: Total Orders per Dish
-        fig_hist = px.histogram(vendor_df, x='Total_Order', color='Item_Name', title=f"📈 Orders for {vendor}'s Dishes")
-        st.plotly_chart(fig_hist, use_container_width=True)
-
-        # Bar Chart: Price per Item
-        price_data = vendor_df.groupby('Item_Name')['Price'].mean().reset_index()
-        fig_price_bar = px.bar(price_data, x='Item_Name', y='Price', title=f"💰 Prices for {vendor}'s Dishes",
-                               color='Price', color_continuous_scale='Viridis')
-        st.plotly_chart(fig_price_bar, use_container_width=True)
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def vendor_charts(version, vendor, diet_type, _data):
+    """Section 7 figures, built once per (data version, vendor, diet)."""
+    metrics.count("cache_misses", cache="vendor_charts")
+    with metrics.timed("charts.vendor_figures"):
+        return charts.vendor_figures(_data, vendor, diet_type)
+
+
+@st.fragment
+@metrics.timed("section.vendor_deep_dive")
+def vendor_deep_dive(name, diet_type, area):
+    vendor = vendor_picker(f"{name}, pick a vendor for a deep dive!", "deep_dive_search", area)
+    if len(vendors.rows(vendor, diet_type)):  # Filter by diet preference for consistency
+        visuals = st.expander(f"🌟 Detailed Visuals for {vendor} in Madurai! 🍽️", expanded=False,
+                              key="vendor_visuals", on_change="rerun")
+        with visuals:
+            # Nothing is built or sent to the browser until the expander is opened
+            if visuals.open:
+                metrics.count("cache_requests", cache="vendor_charts")
+                figures = vendor_charts(data.version, vendor, diet_type, data)
+                with metrics.timed("section.vendor_deep_dive.render"):
+                    for fig in figures:
+                        st.plotly_chart(fig, use_container_width=True)
+
+
+vendor_deep_dive(name, diet_type, area)
 
 # Section 8: Rate the App
 st.markdown("---")
 st.markdown("<h2 style='color: #FF1493;'>Rate the App! 🌟</h2>", unsafe_allow_html=True)
-rating = st.slider("How many stars would you give Sha’s Foodans? (1–5)", 1, 5, 5)
-suggestion = st.text_area("Any suggestions or ideas for Sha? Let’s make Madurai tastier together! 🍽️", height=100)
-if st.button("Submit Feedback"):
-    st.success(f"Thanks, {name}! Your {rating}-star rating and suggestion—'{suggestion}'—mean the world to Sha! 🥰")
+
+
+@st.fragment
+@metrics.timed("section.rate_the_app")
+def rate_the_app(name):
+    rating = st.slider("How many stars would you give Sha’s Foodans? (1–5)", 1, 5, 5)
+    suggestion = st.text_area("Any suggestions or ideas for Sha? Let’s make Madurai tastier together! 🍽️", height=100)
+    if st.button("Submit Feedback"):
+        store.feedback(rating, suggestion, user=name, session=session_id)
+        st.success(f"Thanks, {name}! Your {rating}-star rating and suggestion—'{suggestion}'—mean the world to Sha! 🥰")
+
+
+rate_the_app(name)
 
 # Section 9: Power BI Dashboard (For Internal Use Only)
 st.markdown("---")
@@ -338,3 +353,8 @@ st.markdown(f"""
 # Footer
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: #555;'>Made with ❤️ by Sha for Madurai Foodies!</p>", unsafe_allow_html=True)
+
+if profiler is not None:
+    st.caption(f"Profile of this rerun written to {metrics.stop_profile(profiler)}")
+    del st.query_params["profile"]  # one rerun only
+metrics.stop(rerun)
@@ -0,0 +1,12 @@
+"""Shared data and recommendation layer behind the Foodans Streamlit app."""
+
+from foodans_core.data import DATA_PATH, FoodData, build_data, load_data, reload_data, update_data
+
+__all__ = [
+    "DATA_PATH",
+    "FoodData",
+    "build_data",
+    "load_data",
+    "reload_data",
+    "update_data",
+]
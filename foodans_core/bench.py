@@ -0,0 +1,253 @@
+"""Headless latency benchmark for the recommendation paths.
+
+Runs each section's data work (no Streamlit) against the bundled menu or
+synthetic menus from ``foodans_core.synth`` and writes a JSON report with
+startup time, p50/p95 latency per path and peak memory, so runs from
+different commits can be compared.  Cold starts (a fresh interpreter,
+imports included) are measured for the app's original load -- read the CSV,
+compute Score, fit one KNN -- and for ``build_data``, so the report shows
+what loading costs against the app before any of this package existed.
+
+Usage::
+
+    python -m foodans_core.bench --rows 10000 100000 1000000 --out bench.json
+    python -m foodans_core.bench --baseline old.json --out new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from foodans_core import charts, recommend, storage
+from foodans_core.data import DATA_PATH, build_data
+from foodans_core.synth import generate
+
+DIETS = recommend.DIETS
+PRICE_BANDS = list(recommend.PRICE_BANDS.values())
+RATING_BANDS = list(recommend.RATING_BANDS.values())
+
+
+# -- Section paths not covered by foodans_core.recommend --------------------
+
+def vendor_explorer(data, area, diet):
+    df, vendors = data.df, data.vendors
+    tables = [df.iloc[vendors.top_items(v, diet, area=area, k=5)].to_dict('records')
+              for v in vendors.vendors_in_area(area, diet).index]
+    tables.append(df.iloc[data.index.top(area=area, diet=diet, by='Total_Order', k=5)].to_dict('records'))
+    return tables
+
+
+# -- Harness ---------------------------------------------------------------
+
+def _queries(data, rng, n):
+    areas, types, names = data.index.areas, data.index.types, data.vendors.names
+    pick = lambda seq: seq[rng.integers(len(seq))]  # noqa: E731
+    yield from (
+        {
+            'area': pick(areas), 'category': pick(types), 'diet': pick(DIETS), 'vendor': pick(names),
+            'price': pick(PRICE_BANDS), 'rating': pick(RATING_BANDS),
+        }
+        for _ in range(n)
+    )
+
+
+PATHS = {
+    'top_vendors': lambda d, q: recommend.top_vendors(d, q['area'], q['diet']),
+    'find_food': lambda d, q: recommend.find_food(d, q['area'], q['category'], q['diet'], q['price'], q['rating']),
+    'whats_next': lambda d, q: recommend.next_meals(d, q['category'], q['area'], q['diet']),
+    'vendor_explorer': lambda d, q: vendor_explorer(d, q['area'], q['diet']),
+    'vendor_detail': lambda d, q: charts.vendor_figures(d, q['vendor'], q['diet']),
+    # A vendor name half typed into the search box
+    'search': lambda d, q: recommend.search_menu(d, q['vendor'][:5], q['diet']),
+    'search_vendors': lambda d, q: recommend.search_vendors(d, q['vendor'][:5]),
+}
+
+
+def _percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return {'p50_ms': round(float(np.percentile(ms, 50)), 3),
+            'p95_ms': round(float(np.percentile(ms, 95)), 3),
+            'mean_ms': round(float(ms.mean()), 3),
+            'n': len(ms)}
+
+
+# Run in a fresh interpreter with the menu path as argv[1]; prints seconds and max RSS as JSON
+_COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+path = sys.argv[1]
+{load}
+seconds = time.perf_counter() - start
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+except ImportError:
+    rss = None
+print(json.dumps({{'seconds': round(seconds, 3), 'max_rss_mb': rss and round(rss, 1)}}))
+"""
+
+COLD_LOADS = {
+    # The app's load before foodans_core (baseline foodans.py)
+    'original': """
+import pandas as pd
+from sklearn.neighbors import NearestNeighbors
+df = pd.read_csv(path).dropna()
+df['Score'] = 0.6 * df['Avg_Rating'] + 0.4 * (df['Total_Order'] / df['Total_Order'].max())
+knn_data = df[['Price', 'Avg_Rating']].copy()
+knn_data['Food_Type'] = df['Food_Type'].map({'Veg': 0, 'Non-Veg': 1})
+NearestNeighbors(n_neighbors=5).fit(knn_data)
+""",
+    'build_data': """
+from foodans_core import storage
+from foodans_core.data import build_data
+build_data(storage.read_frame(path))
+""",
+}
+
+
+def _cold_start(load, path):
+    """Seconds and max RSS of ``COLD_LOADS[load]`` on ``path`` in a fresh interpreter."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    out = subprocess.run([sys.executable, '-c', _COLD_START.format(load=COLD_LOADS[load]), path],
+                         capture_output=True, text=True, env=env, check=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def _startup(path):
+    start = time.perf_counter()
+    data = build_data(storage.read_frame(path))
+    return data, time.perf_counter() - start
+
+
+def _peak_startup_mb(path):
+    tracemalloc.start()
+    try:
+        build_data(storage.read_frame(path))
+        return round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(rss / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+def run_dataset(csv_path, queries=200, seed=0, columnar=True, paths=PATHS):
+    """Benchmark one menu file; returns the report entry for it."""
+    result = {'source': csv_path}
+    data, result['startup_csv_s'] = _startup(csv_path)
+    result['rows'] = len(data.df)
+    result['peak_startup_mb'] = _peak_startup_mb(csv_path)
+    result['cold_start'] = {'original': _cold_start('original', csv_path),
+                            'csv': _cold_start('build_data', csv_path)}
+    if columnar and storage.has_columnar_support():
+        columnar_file = storage.convert(csv_path, os.path.join(tempfile.mkdtemp(), 'menu.parquet'))
+        _, result['startup_columnar_s'] = _startup(columnar_file)
+        result['cold_start']['columnar'] = _cold_start('build_data', columnar_file)
+        os.remove(columnar_file)
+
+    rng = np.random.default_rng(seed)
+    qs = list(_queries(data, rng, queries))
+    result['paths'] = {}
+    for name, fn in paths.items():
+        fn(data, qs[0])  # warm-up (lazy KNN sub-indexes, imports)
+        samples = []
+        for q in qs:
+            start = time.perf_counter()
+            fn(data, q)
+            samples.append(time.perf_counter() - start)
+        result['paths'][name] = _percentiles(samples)
+    result['max_rss_mb'] = _max_rss_mb()
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(report, baseline):
+    old = {d['rows']: d for d in baseline.get('datasets', [])}
+    for entry in report['datasets']:
+        prev = old.get(entry['rows'])
+        if prev is None:
+            continue
+        for name, stats in entry['paths'].items():
+            before = prev.get('paths', {}).get(name)
+            if before and before['p95_ms']:
+                print(f"  {entry['rows']:>9} {name:<16} p95 {before['p95_ms']:>9.2f} -> {stats['p95_ms']:>9.2f} ms"
+                      f" ({stats['p95_ms'] / before['p95_ms']:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation paths without Streamlit.")
+    parser.add_argument('--rows', type=int, nargs='*', default=[],
+                        help="synthetic menu sizes to generate (default: only the bundled CSV)")
+    parser.add_argument('--data', nargs='*', default=None, help="existing menu CSVs to benchmark")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='bench_report.json')
+    parser.add_argument('--baseline', help="earlier report to compare p95 latencies against")
+    args = parser.parse_args(argv)
+
+    sources = list(args.data or ([] if args.rows else [DATA_PATH]))
+    tmpdir = tempfile.mkdtemp()
+    for n in args.rows:
+        path = os.path.join(tmpdir, f'synthetic_{n}.csv')
+        generate(n, seed=args.seed).to_csv(path, index=False)
+        sources.append(path)
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'queries': args.queries,
+        'datasets': [],
+    }
+    for path in sources:
+        entry = run_dataset(path, queries=args.queries, seed=args.seed)
+        report['datasets'].append(entry)
+        print(f"{entry['rows']:>9} rows  startup csv {entry['startup_csv_s']:.2f}s"
+              + (f" / columnar {entry['startup_columnar_s']:.2f}s" if 'startup_columnar_s' in entry else '')
+              + f"  peak {entry['peak_startup_mb']} MiB  rss {entry['max_rss_mb']} MiB")
+        original = entry['cold_start']['original']
+        for load, stats in entry['cold_start'].items():
+            print(f"    cold start {load:<9} {stats['seconds']:>6.2f}s ({stats['seconds'] / original['seconds']:.2f}x)"
+                  f"  rss {stats['max_rss_mb']} MiB")
+        for name, stats in entry['paths'].items():
+            print(f"    {name:<16} p50 {stats['p50_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms")
+        if path.startswith(tmpdir):
+            os.remove(path)
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            _compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
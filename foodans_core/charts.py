@@ -0,0 +1,28 @@
+"""Plotly figures for the "Know Your Vendor Detailed!" section.
+
+Building them is pure data work, so the app caches the result per
+(data version, vendor, diet) and only asks for it once the expander is open.
+"""
+
+import plotly.express as px
+
+
+def vendor_figures(data, vendor, diet='Both'):
+    """Dish popularity, ratings, order histogram and prices for ``vendor``; [] if it has no rows."""
+    vendor_df = data.df.iloc[data.vendors.rows(vendor, diet)]
+    if vendor_df.empty:
+        return []
+    by_item = vendor_df.groupby('Item_Name', observed=True)
+    return [
+        # Pie Chart: Dish Distribution by Total Orders
+        px.pie(by_item['Total_Order'].sum().reset_index(), names='Item_Name', values='Total_Order',
+               title=f"🍵 Dish Popularity at {vendor}"),
+        # Bar Chart: Average Rating Distribution
+        px.bar(by_item['Avg_Rating'].mean().reset_index(), x='Item_Name', y='Avg_Rating',
+               title=f"⭐ Ratings for {vendor}'s Dishes"),
+        # Histogram: Total Orders per Dish
+        px.histogram(vendor_df, x='Total_Order', color='Item_Name', title=f"📈 Orders for {vendor}'s Dishes"),
+        # Bar Chart: Price per Item
+        px.bar(by_item['Price'].mean().reset_index(), x='Item_Name', y='Price', title=f"💰 Prices for {vendor}'s Dishes",
+               color='Price', color_continuous_scale='Viridis'),
+    ]
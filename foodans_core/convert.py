@@ -0,0 +1,23 @@
+"""Convert the menu CSV into the typed columnar file ``load_data`` prefers.
+
+Usage: ``python -m foodans_core.convert [csv] [out]``
+"""
+
+import argparse
+import os
+
+from foodans_core.data import DATA_PATH
+from foodans_core.storage import convert
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the menu CSV to a typed columnar file.")
+    parser.add_argument('csv', nargs='?', default=DATA_PATH)
+    parser.add_argument('out', nargs='?', default=None, help="defaults to the CSV path with a .parquet suffix")
+    args = parser.parse_args(argv)
+    out = convert(args.csv, args.out)
+    print(f"Wrote {out} ({os.path.getsize(out) / 1024:.0f} KiB, from {os.path.getsize(args.csv) / 1024:.0f} KiB CSV)")
+
+
+if __name__ == '__main__':
+    main()
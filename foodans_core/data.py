@@ -0,0 +1,205 @@
+"""Process-wide data/model cache.
+
+Streamlit reruns ``foodans.py`` on every widget interaction, so anything
+expensive (file parse, score column, KNN fit) lives here and is built once per
+process.  All sessions share the same ``FoodData`` snapshot read-only; a new
+snapshot is built when the source file changes (mtime/size first, then a
+content hash so a plain ``touch`` does not trigger a refit) or when
+``reload_data()`` is called.  The source is the columnar copy written by
+``foodans_core.convert`` when it matches the CSV, otherwise the CSV itself.
+``update_data()`` swaps in a snapshot with a delta batch applied instead (see
+``foodans_core.ingest``).
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from foodans_core import metrics, storage
+from foodans_core.index import QueryIndex
+from foodans_core.search import SearchIndex
+from foodans_core.similarity import SimilarityEngine
+from foodans_core.transitions import TransitionTable, load_transitions
+from foodans_core.vendors import VendorSummary
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'modified_madurai_food_shops.csv')
+
+# Columns identifying one menu row (orders and deltas refer to rows by these)
+KEYS = ['Name', 'Item_Name', 'Area']
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FoodData:
+    """One immutable version of the menu plus everything derived from it."""
+
+    df: pd.DataFrame
+    similar: SimilarityEngine
+    index: QueryIndex
+    vendors: VendorSummary
+    transitions: TransitionTable
+    search: SearchIndex
+    version: str
+    source: str = ''
+    loaded_at: float = field(default_factory=time.time)
+    order_watermark: int = 0  # newest event-store order already counted in Total_Order
+
+
+@dataclass
+class _CacheEntry:
+    stat_key: tuple
+    digest: str
+    data: FoodData
+
+
+_lock = threading.Lock()
+_cache = {}
+
+
+def score(avg_rating, total_order, max_order):
+    """Ranking score: 60% rating, 40% orders relative to the busiest item."""
+    return 0.6 * avg_rating + 0.4 * (total_order / max_order)
+
+
+def add_orders(df, orders):
+    """``df`` with recorded ``orders`` (``Name``, ``Item_Name``, ``Area``, ``orders``) added to ``Total_Order``."""
+    orders = orders.astype({k: str for k in KEYS}).groupby(KEYS, as_index=False)['orders'].sum()
+    extra = df[KEYS].astype(str).merge(orders, on=KEYS, how='left')['orders'].fillna(0)
+    return df.assign(Total_Order=df['Total_Order'] + extra.to_numpy(dtype='int64'))
+
+
+def build_data(df, version='', source='', transitions=None, orders=None):
+    """Clean ``df`` and derive the score column and every lookup structure from it.
+
+    ``orders`` (see ``events.EventStore.order_counts``) is added to ``Total_Order`` before scoring.
+    Rows repeating the ``KEYS`` of an earlier row are dropped, so orders and
+    deltas always refer to exactly one row.
+    """
+    with metrics.timed('build.clean'):
+        df = df.dropna()
+        repeated = df.duplicated(KEYS)
+        if repeated.any():
+            logger.warning("Dropped %d rows repeating the (Name, Item_Name, Area) of an earlier row",
+                           int(repeated.sum()))
+            df = df[~repeated]
+        df = df.reset_index(drop=True)
+        metrics.scanned(len(df))
+        if orders is not None and len(orders):
+            df = add_orders(df, orders)
+
+        # Score for ranking
+        df['Score'] = score(df['Avg_Rating'], df['Total_Order'], df['Total_Order'].max())
+
+    # Scaled, constraint-aware KNN (sub-indexes are fitted on first use)
+    with metrics.timed('build.similarity'):
+        similar = SimilarityEngine(df)
+
+    with metrics.timed('build.index'):
+        index = QueryIndex(df)
+    with metrics.timed('build.vendors'):
+        vendors = VendorSummary(df)
+    with metrics.timed('build.transitions'):
+        transitions = TransitionTable(df, index, transitions or load_transitions(source))
+    # Built on the first search, timed as build.search
+    search = SearchIndex(df)
+
+    logger.info("Loaded %d rows (version %s): %d types, %d areas",
+                len(df), version or '-', df['Type'].nunique(), df['Area'].nunique())
+    return FoodData(df=df, similar=similar, index=index, vendors=vendors, transitions=transitions,
+                    search=search, version=version, source=source,
+                    order_watermark=0 if orders is None else orders.attrs.get('last_id', 0))
+
+
+def _stat_key(path):
+    # Covers the columnar copy too, so converting or re-exporting the CSV is noticed
+    key = []
+    for p in (path, storage.columnar_path(path)):
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:
+            key.append(None)
+        else:
+            key.append((st.st_mtime_ns, st.st_size))
+    return tuple(key)
+
+
+def load_data(path=DATA_PATH, orders=None):
+    """Return the shared ``FoodData`` for ``path``, rebuilding it if the file changed.
+
+    ``orders`` (a counts frame, or a callable returning one) is only used when a
+    new snapshot is built; see ``build_data``.
+    """
+    path = os.path.abspath(path)
+    stat_key = _stat_key(path)
+    if stat_key == (None, None):
+        raise FileNotFoundError(path)
+    entry = _cache.get(path)
+    if entry is not None and entry.stat_key == stat_key:
+        metrics.cache('data', hit=True)
+        return entry.data
+
+    metrics.cache('data', hit=False)
+    with _lock:
+        # Another session may have rebuilt while we waited for the lock
+        entry = _cache.get(path)
+        if entry is not None and entry.stat_key == stat_key:
+            return entry.data
+        digest = storage.file_digest(path) if stat_key[0] is not None else None
+        source = storage.pick_source(path, digest)
+        if digest is None:
+            # Only the columnar copy is left: version it by the CSV it came from
+            digest = storage.source_digest(source) or storage.file_digest(source)
+        if entry is not None and entry.digest == digest and entry.data.source == source:
+            # Touched but unchanged: keep the current snapshot
+            entry.stat_key = stat_key
+            return entry.data
+        version = digest[:12]
+        if callable(orders):
+            orders = orders()
+        if orders is not None and len(orders):
+            # Recorded orders only grow, so their total tells snapshots apart
+            version += f"+{int(orders['orders'].sum())}"
+        with metrics.timed('load.read'):
+            df = storage.read_frame(source)
+            metrics.scanned(len(df))
+        data = build_data(df, version=version, source=source, orders=orders)
+        _cache[path] = _CacheEntry(stat_key, digest, data)
+        return data
+
+
+def reload_data(path=DATA_PATH, orders=None):
+    """Drop the cached snapshot for ``path`` and build a fresh one."""
+    path = os.path.abspath(path)
+    with _lock:
+        _cache.pop(path, None)
+    return load_data(path, orders)
+
+
+def update_data(path=DATA_PATH, expected=None, **delta):
+    """Apply a delta batch to the shared snapshot for ``path`` and return the new snapshot.
+
+    See ``ingest.apply_delta`` for the arguments.  Nothing is applied (and
+    None returned) unless ``load_data(path)`` has built a snapshot for the
+    file as it is now, and, with ``expected``, the shared snapshot is still
+    that one; a snapshot is never built here, where the recorded orders
+    ``load_data`` folds in are not known.  The delta lives in memory only:
+    when the file changes, the snapshot is rebuilt from the file.
+    """
+    from foodans_core.ingest import apply_delta
+
+    path = os.path.abspath(path)
+    stat_key = _stat_key(path)
+    with _lock:
+        entry = _cache.get(path)
+        if entry is None or entry.stat_key != stat_key:
+            return None
+        if expected is not None and entry.data is not expected:
+            return None
+        entry.data = apply_delta(entry.data, **delta)
+        return entry.data
@@ -0,0 +1,287 @@
+"""Durable store for feedback and "Order Now!" clicks.
+
+Events go into an append-only SQLite table in WAL mode.  ``record`` only puts
+the event on an in-memory queue.  One background writer thread per store
+drains the queue and commits everything waiting in a single transaction, so
+a Streamlit rerun never waits on disk.
+
+``compact`` folds old order events into the ``order_counts`` table and
+truncates the WAL.  ``order_counts`` reads the compacted and raw orders
+together; pass it to ``load_data``/``reload_data`` to fold the orders into
+``Total_Order`` and ``Score``.  ``order_counts(after_id=...)`` returns only
+the orders recorded since a snapshot was built, which ``ingest.follow_orders``
+feeds into the live snapshot.
+
+The database defaults to ``foodans_events.db`` next to the menu; set the
+``FOODANS_EVENTS`` environment variable to put it elsewhere.
+
+Usage: ``python -m foodans_core.events compact`` or ``... counts``
+"""
+
+import argparse
+import atexit
+import contextlib
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from foodans_core import metrics
+from foodans_core.data import DATA_PATH
+
+EVENTS_ENV = 'FOODANS_EVENTS'
+EVENTS_FILE = 'foodans_events.db'
+
+EVENT_COLUMNS = ('ts', 'kind', 'session', 'user', 'vendor', 'item', 'area', 'rating', 'text', 'source')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts      REAL NOT NULL,
+    kind    TEXT NOT NULL,
+    session TEXT,
+    user    TEXT,
+    vendor  TEXT,
+    item    TEXT,
+    area    TEXT,
+    rating  INTEGER,
+    text    TEXT,
+    source  TEXT
+);
+CREATE INDEX IF NOT EXISTS events_kind_ts ON events (kind, ts);
+CREATE TABLE IF NOT EXISTS order_counts (
+    vendor TEXT NOT NULL,
+    item   TEXT NOT NULL,
+    area   TEXT NOT NULL,
+    orders INTEGER NOT NULL,
+    PRIMARY KEY (vendor, item, area)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_INSERT = f"INSERT INTO events ({', '.join(EVENT_COLUMNS)}) VALUES ({', '.join('?' * len(EVENT_COLUMNS))})"
+
+_ORDER_COUNTS = """
+SELECT vendor, item, area, SUM(orders) FROM (
+    SELECT vendor, item, area, orders FROM order_counts
+    UNION ALL
+    SELECT vendor, item, area, COUNT(*) FROM events WHERE kind = 'order' GROUP BY vendor, item, area
+) GROUP BY vendor, item, area
+"""
+
+_NEW_ORDERS = """
+SELECT vendor, item, area, COUNT(*) FROM events WHERE kind = 'order' AND id > ? GROUP BY vendor, item, area
+"""
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+def events_path():
+    """$FOODANS_EVENTS, else ``foodans_events.db`` next to the bundled menu."""
+    return os.environ.get(EVENTS_ENV) or os.path.join(os.path.dirname(DATA_PATH), EVENTS_FILE)
+
+
+class EventStore:
+    """Append-only event log with a batching background writer."""
+
+    def __init__(self, path=None, batch_size=500, max_pending=100_000):
+        self.path = os.path.abspath(path or events_path())
+        self.batch_size = batch_size
+        self.dropped = 0  # events lost because the queue was full or a write failed
+        self._queue = queue.Queue(maxsize=max_pending)
+        with contextlib.closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+        self._thread = threading.Thread(target=self._run, name='foodans-events', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    # -- Writing -----------------------------------------------------------
+
+    def record(self, kind, **fields):
+        """Queue one event; never blocks (the event is dropped if the writer is far behind)."""
+        unknown = set(fields) - set(EVENT_COLUMNS)
+        if unknown:
+            raise TypeError(f"unknown event fields: {', '.join(sorted(unknown))}")
+        fields.update(ts=time.time(), kind=kind)
+        try:
+            self._queue.put_nowait(tuple(fields.get(col) for col in EVENT_COLUMNS))
+        except queue.Full:
+            self.dropped += 1
+            metrics.count('events_dropped')
+
+    def order(self, vendor, item, area, user=None, session=None, source=None):
+        """Record an "Order Now!" click for one menu row."""
+        self.record('order', vendor=str(vendor), item=str(item), area=str(area),
+                    user=user, session=session, source=source)
+
+    def feedback(self, rating, text='', user=None, session=None):
+        """Record a "Rate the App" submission."""
+        self.record('feedback', rating=int(rating), text=text, user=user, session=session)
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                batch, waiters, stop = [], [], False
+                item = self._queue.get()
+                while True:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    try:
+                        with conn, metrics.timed('events.write'):
+                            conn.executemany(_INSERT, batch)
+                        metrics.count('events_written', len(batch))
+                    except sqlite3.Error:
+                        self.dropped += len(batch)
+                        logger.exception("Dropped %d events", len(batch))
+                for waiter in waiters:
+                    waiter.set()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def flush(self, timeout=None):
+        """Block until every event queued before this call is committed."""
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        """Commit what is queued and stop the writer."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    # -- Reading -----------------------------------------------------------
+
+    def order_counts(self, after_id=None):
+        """Orders per menu row as a DataFrame with ``Name``, ``Item_Name``, ``Area`` and ``orders``.
+
+        With ``after_id`` only order events newer than that id are counted, or
+        None is returned if some of them were compacted already.
+        ``counts.attrs['last_id']`` is the newest order event included.
+        """
+        with contextlib.closing(self._connect()) as conn:
+            # One read transaction, so the counts and last_id agree
+            conn.execute('BEGIN')
+            compacted = conn.execute("SELECT value FROM meta WHERE key = 'compacted_through'").fetchone()
+            compacted = compacted[0] if compacted else 0
+            if after_id is not None and after_id < compacted:
+                return None
+            last_id = conn.execute("SELECT MAX(id) FROM events WHERE kind = 'order'").fetchone()[0]
+            if after_id is None:
+                rows = conn.execute(_ORDER_COUNTS).fetchall()
+            else:
+                rows = conn.execute(_NEW_ORDERS, (after_id,)).fetchall()
+            conn.rollback()
+        counts = pd.DataFrame(rows, columns=['Name', 'Item_Name', 'Area', 'orders'])
+        counts = counts.astype({'orders': 'int64'})
+        counts.attrs['last_id'] = max(last_id or 0, compacted, after_id or 0)
+        return counts
+
+    def events(self, kind=None, since=None):
+        """Raw (not yet compacted) events, oldest first."""
+        sql, params = f"SELECT id, {', '.join(EVENT_COLUMNS)} FROM events WHERE 1", []
+        if kind is not None:
+            sql += " AND kind = ?"
+            params.append(kind)
+        if since is not None:
+            sql += " AND ts >= ?"
+            params.append(since)
+        with contextlib.closing(self._connect()) as conn:
+            return pd.read_sql_query(sql + " ORDER BY id", conn, params=params)
+
+    # -- Maintenance -------------------------------------------------------
+
+    def compact(self, before=None):
+        """Fold order events older than ``before`` (default: now) into ``order_counts``.
+
+        Feedback events are kept.  Returns the number of order events folded.
+        """
+        before = time.time() if before is None else before
+        conn = self._connect()
+        try:
+            with conn:
+                # Fold a prefix of the ids, so order_counts(after_id) can tell what is gone
+                through = conn.execute("SELECT MAX(id) FROM events WHERE kind = 'order' AND ts < ?",
+                                       (before,)).fetchone()[0]
+                folded = 0
+                if through is not None:
+                    conn.execute(
+                        "INSERT INTO order_counts (vendor, item, area, orders)"
+                        " SELECT vendor, item, area, COUNT(*) FROM events"
+                        " WHERE kind = 'order' AND id <= ? GROUP BY vendor, item, area"
+                        " ON CONFLICT (vendor, item, area) DO UPDATE SET orders = orders + excluded.orders",
+                        (through,))
+                    folded = conn.execute("DELETE FROM events WHERE kind = 'order' AND id <= ?",
+                                          (through,)).rowcount
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('compacted_through', ?)",
+                                 (through,))
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        finally:
+            conn.close()
+        logger.info("Compacted %d order events in %s", folded, self.path)
+        return folded
+
+
+_lock = threading.Lock()
+_stores = {}
+
+
+def open_store(path=None):
+    """The process-wide ``EventStore`` for ``path`` (one writer thread per database)."""
+    path = os.path.abspath(path or events_path())
+    with _lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = EventStore(path)
+        return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the feedback/order event store.")
+    parser.add_argument('command', choices=['compact', 'counts'])
+    parser.add_argument('--db', default=None, help=f"event database (default: ${EVENTS_ENV} or {EVENTS_FILE})")
+    parser.add_argument('--older-than', type=float, default=0,
+                        help="compact only order events older than this many hours")
+    args = parser.parse_args(argv)
+    store = open_store(args.db)
+    if args.command == 'compact':
+        folded = store.compact(before=time.time() - args.older_than * 3600)
+        print(f"Folded {folded} order events into order_counts ({store.path})")
+    else:
+        print(store.order_counts().sort_values('orders', ascending=False).to_string(index=False))
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
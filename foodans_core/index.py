@@ -0,0 +1,168 @@
+"""Pre-partitioned row index for the Area / Type / Food_Type filters.
+
+Rows are grouped once into (Area, Type, Food_Type) partitions.  Each partition
+keeps its row positions pre-sorted by ``Score``, by ``Total_Order`` and by
+``Price`` so a "top-k in this slice within a price/rating band" query is a dict
+lookup, a binary search on price and a scan of the matching candidates only --
+never a pass over the whole frame.
+"""
+
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from foodans_core import metrics
+
+DIET_FILTERS = {'Both': None, 'Veg': 'Veg', 'Non-Veg': 'Non-Veg'}
+
+# Columns each partition is pre-sorted by (descending)
+SORT_KEYS = ('Score', 'Total_Order')
+
+PARTITION_KEYS = ['Area', 'Type', 'Food_Type']
+
+_EMPTY = np.empty(0, dtype=np.intp)
+
+
+def diet_food_type(diet):
+    """Map a UI diet preference ("Both"/"Veg"/"Non-Veg") to a Food_Type value or None."""
+    try:
+        return DIET_FILTERS[diet]
+    except KeyError:
+        raise ValueError(f"Unknown diet preference: {diet!r}") from None
+
+
+def label_codes(series):
+    """Integer code per row of ``series`` and the labels the codes index (categories when categorical)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), np.asarray(series.cat.categories)
+    codes, uniques = pd.factorize(series)
+    return codes, np.asarray(uniques)
+
+
+class Partition:
+    """Row positions of one (Area, Type, Food_Type) slice in several orders."""
+
+    __slots__ = ('positions', 'by_price', 'prices', 'sorted_by')
+
+    def __init__(self, positions, price, keys):
+        self.positions = positions
+        order = np.argsort(price[positions], kind='stable')
+        self.by_price = positions[order]
+        self.prices = price[self.by_price]
+        self.sorted_by = {
+            name: positions[np.argsort(-values[positions], kind='stable')]
+            for name, values in keys.items()
+        }
+
+    def __len__(self):
+        return len(self.positions)
+
+
+class QueryIndex:
+    """Answer slice queries over ``df`` by partition lookup instead of boolean masks."""
+
+    def __init__(self, df):
+        self._columns(df)
+        groups = df.groupby(PARTITION_KEYS, sort=False, observed=True).indices
+        self._partitions = {key: Partition(np.asarray(positions, dtype=np.intp), self._price, self._keys)
+                            for key, positions in groups.items()}
+        self._register()
+
+    def _columns(self, df):
+        self._price = df['Price'].to_numpy()
+        self._rating = df['Avg_Rating'].to_numpy()
+        self._keys = {name: df[name].to_numpy() for name in SORT_KEYS}
+
+    def _register(self):
+        # Every partition is also registered under its wildcard keys so that
+        # "any area" / "any type" / "both diets" lookups stay O(1)
+        self._lookup = {}
+        for key, part in self._partitions.items():
+            for mask in product((True, False), repeat=3):
+                wild = tuple(k if keep else None for k, keep in zip(key, mask))
+                self._lookup.setdefault(wild, []).append(part)
+
+        self.areas = sorted({k[0] for k in self._partitions})
+        self.types = sorted({k[1] for k in self._partitions})
+        self._areas_by_type = {t: sorted({k[0] for k in self._partitions if k[1] == t})
+                               for t in self.types}
+
+    def updated(self, df, rows):
+        """Index for ``df`` where only ``rows`` changed or were appended.
+
+        Partitions without any of ``rows`` are shared with this index; the
+        rest are re-sorted.  ``df`` must keep every existing row at its
+        position and in its partition.
+        """
+        new = QueryIndex.__new__(QueryIndex)
+        new._columns(df)
+        n_old = len(self._price)
+        new._partitions = dict(self._partitions)
+        rows = np.asarray(rows, dtype=np.intp)
+        touched = df.iloc[rows].groupby(PARTITION_KEYS, sort=False, observed=True).indices
+        for key, local in touched.items():
+            positions = rows[local]
+            positions = np.sort(positions[positions >= n_old])  # appended rows
+            old = self._partitions.get(key)
+            if old is not None:
+                positions = np.concatenate([old.positions, positions])
+            new._partitions[key] = Partition(positions, new._price, new._keys)
+        new._register()
+        return new
+
+    def areas_for_type(self, type_):
+        """Areas that serve at least one item of ``type_``."""
+        return self._areas_by_type.get(type_, [])
+
+    def partitions(self, area=None, type_=None, diet='Both'):
+        return self._lookup.get((area, type_, diet_food_type(diet)), [])
+
+    def count(self, area=None, type_=None, diet='Both'):
+        return sum(len(p) for p in self.partitions(area, type_, diet))
+
+    def top(self, area=None, type_=None, diet='Both', price=None, rating=None, k=None, by='Score'):
+        """Row positions in the slice, best first.
+
+        ``price`` and ``rating`` are inclusive ``(low, high)`` bounds (like
+        ``Series.between``).  ``by`` is one of ``SORT_KEYS`` or ``None`` for
+        the original row order.  ``k=None`` returns every matching row.
+        """
+        parts = self.partitions(area, type_, diet)
+        if not parts:
+            return _EMPTY
+
+        candidates = []
+        for part in parts:
+            if price is not None:
+                lo = np.searchsorted(part.prices, price[0], side='left')
+                hi = np.searchsorted(part.prices, price[1], side='right')
+                rows = part.by_price[lo:hi]
+            elif by is None:
+                rows = part.positions
+            else:
+                rows = part.sorted_by[by]
+            if rating is not None and len(rows):
+                r = self._rating[rows]
+                rows = rows[(r >= rating[0]) & (r <= rating[1])]
+            candidates.append(rows)
+        if metrics.enabled:
+            metrics.scanned(sum(len(rows) for rows in candidates))
+
+        # A single pre-sorted partition needs no further ordering
+        presorted = price is None and len(candidates) == 1
+        rows = candidates[0] if len(candidates) == 1 else np.concatenate(candidates)
+        if by is None:
+            rows = rows if presorted else np.sort(rows)
+        elif not presorted:
+            rows = self._order(rows, by, k)
+        return rows if k is None else rows[:k]
+
+    def _order(self, rows, by, k):
+        values = self._keys[by][rows]
+        if k is not None and k < len(rows):
+            # Only the k best need a full sort
+            keep = np.argpartition(-values, k - 1)[:k]
+            rows, values = rows[keep], values[keep]
+        # Ties keep row order so results are deterministic
+        return rows[np.lexsort((rows, -values))]
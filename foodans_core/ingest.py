@@ -0,0 +1,208 @@
+"""Incremental ingestion of menu deltas.
+
+A delta batch is any mix of
+
+* ``new_rows`` -- menu rows in the CSV layout (new items or whole new vendors);
+* ``prices`` -- ``Name``, ``Item_Name``, ``Area`` and the new ``Price``;
+* ``orders`` -- ``Name``, ``Item_Name``, ``Area`` and an ``orders`` increment.
+
+``apply_delta`` turns a ``FoodData`` snapshot and a delta into a new snapshot
+without a full rebuild.  Score is recomputed for the touched rows only, and
+for the whole column only when the busiest item's order count (its
+denominator) changes.  The query index re-sorts only the touched partitions,
+the vendor summary re-aggregates only the touched vendors, the search index
+moves only the touched rows in its Score order, and the similarity engine
+keeps its fitted sub-indexes with a delta buffer.  The old snapshot is
+left untouched for sessions still reading it.  ``data.update_data`` applies a
+delta to the shared snapshot.
+
+``follow_orders`` starts a thread that folds newly recorded "Order Now!"
+clicks from an ``events.EventStore`` into the shared snapshot every few
+seconds.
+"""
+
+import dataclasses
+import itertools
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from foodans_core import metrics, storage
+from foodans_core.data import DATA_PATH, KEYS, load_data, reload_data, score, update_data
+from foodans_core.index import QueryIndex, label_codes
+from foodans_core.transitions import TransitionTable
+from foodans_core.vendors import VendorSummary
+
+_EMPTY = np.empty(0, dtype=np.intp)
+_serial = itertools.count(1)
+
+logger = logging.getLogger(__name__)
+
+
+def _locate(df, items, what):
+    """Row positions of the (Name, Item_Name, Area) in ``items`` that are on the menu, and which ones were.
+
+    ``build_data`` keeps one row per key, so each item matches at most one row.
+    """
+    missing = [col for col in KEYS if col not in items]
+    if missing:
+        raise ValueError(f"{what}: missing columns {', '.join(missing)}")
+    row_key = np.zeros(len(df), dtype=np.int64)
+    item_key = np.zeros(len(items), dtype=np.int64)
+    unknown = np.zeros(len(items), dtype=bool)
+    for col in KEYS:
+        codes, labels = label_codes(df[col])
+        wanted = pd.Index(labels).get_indexer(items[col].astype(str))
+        unknown |= wanted < 0
+        row_key = row_key * (len(labels) + 1) + codes
+        item_key = item_key * (len(labels) + 1) + wanted
+    order = np.argsort(row_key, kind='stable')
+    i = np.minimum(np.searchsorted(row_key[order], item_key), len(df) - 1)
+    found = ~unknown & (row_key[order[i]] == item_key)
+    return order[i[found]], found
+
+
+def _known(df, items, what):
+    rows, found = _locate(df, items, what)
+    if not found.all():
+        logger.warning("%s: skipped %d rows for items not on the menu", what, int((~found).sum()))
+    return rows, found
+
+
+def _append(df, new_rows):
+    new_rows = storage.normalize(pd.DataFrame(new_rows)).dropna()
+    missing = [col for col in df.columns if col != 'Score' and col not in new_rows]
+    if missing:
+        raise ValueError(f"new_rows: missing columns {', '.join(missing)}")
+    repeated = int(new_rows.duplicated(KEYS).sum())
+    if repeated:
+        raise ValueError(f"new_rows: {repeated} rows repeat the (Name, Item_Name, Area) of another new row")
+    known, _ = _locate(df, new_rows, 'new_rows') if len(df) else (_EMPTY, None)
+    if len(known):
+        raise ValueError(f"new_rows: {len(known)} rows are already on the menu; send prices/orders for them")
+
+    new_rows = new_rows[[col for col in df.columns if col != 'Score']].copy()
+    columns = {}
+    for col in new_rows.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Appending categories keeps the existing codes valid
+            values = new_rows[col].astype(str)
+            added = pd.Index(values.unique()).difference(df[col].cat.categories)
+            columns[col] = df[col].cat.add_categories(added) if len(added) else df[col]
+            new_rows[col] = pd.Categorical(values, dtype=columns[col].dtype)
+        else:
+            values = storage.compact(new_rows[col], df[col].dtype)
+            if values.dtype != df[col].dtype:
+                columns[col] = df[col].astype(values.dtype)
+            new_rows[col] = values
+    return pd.concat([df.assign(**columns), new_rows], ignore_index=True)
+
+
+@metrics.timed('ingest.delta')
+def apply_delta(data, new_rows=None, prices=None, orders=None, watermark=None):
+    """``data`` with ``new_rows`` appended, ``prices`` set and ``orders`` added, as a new ``FoodData``.
+
+    ``watermark`` is the newest event-store order included in ``orders``
+    (see ``events.EventStore.order_counts``).
+    """
+    start = time.perf_counter()
+    df = data.df
+    n_old = len(df)
+
+    price = df['Price'].to_numpy()
+    moved = _EMPTY
+    if prices is not None and len(prices):
+        rows, found = _known(df, prices, 'prices')
+        values = storage.compact(prices['Price'].to_numpy()[found], price.dtype)
+        moved = np.unique(rows[price[rows] != values])
+        price = price.astype(values.dtype)  # a fractional price turns the column into float64
+        price[rows] = values
+
+    total = df['Total_Order'].to_numpy()
+    counted = _EMPTY
+    if orders is not None and len(orders):
+        rows, found = _known(df, orders, 'orders')
+        total = total.copy()
+        np.add.at(total, rows, orders['orders'].to_numpy()[found].astype(total.dtype))
+        counted = np.unique(rows)
+
+    df = df.assign(Price=price, Total_Order=total)
+    if new_rows is not None and len(new_rows):
+        df = _append(df, new_rows)
+    added = np.arange(n_old, len(df), dtype=np.intp)
+
+    # Score only depends on the busiest item through its order count
+    max_order = df['Total_Order'].max()
+    rescored = max_order != data.df['Total_Order'].max()
+    scored = np.union1d(counted, added)
+    if rescored:
+        df = df.assign(Score=score(df['Avg_Rating'], df['Total_Order'], max_order))
+    elif len(scored):
+        values = df['Score'].to_numpy().copy()
+        values[scored] = score(df['Avg_Rating'].to_numpy()[scored], df['Total_Order'].to_numpy()[scored], max_order)
+        df = df.assign(Score=values)
+
+    if rescored:
+        index, vendors = QueryIndex(df), VendorSummary(df)
+    else:
+        touched = np.union1d(moved, scored)
+        index = data.index.updated(df, touched) if len(touched) else data.index
+        vendors = data.vendors.updated(df, df['Name'].iloc[scored].unique()) if len(scored) else data.vendors
+    similar = data.similar.updated(df, moved) if len(moved) or len(added) else data.similar
+    transitions, search = data.transitions, data.search
+    if rescored or len(scored):
+        transitions = TransitionTable(df, index, transitions.transitions, transitions.per_type, transitions.limit)
+        search = search.updated(df, np.arange(len(df)) if rescored else scored)
+
+    version = f"{data.version.partition('~')[0]}~{next(_serial)}"
+    logger.info("Applied delta (version %s): %d new rows, %d price changes, %d items with new orders%s in %.0f ms",
+                version, len(added), len(moved), len(counted), ", full rescore" if rescored else "",
+                (time.perf_counter() - start) * 1000)
+    return dataclasses.replace(
+        data, df=df, similar=similar, index=index, vendors=vendors, transitions=transitions, search=search,
+        version=version, loaded_at=time.time(),
+        order_watermark=data.order_watermark if watermark is None else watermark)
+
+
+# -- Live orders -----------------------------------------------------------
+
+def fold_new_orders(store, path=DATA_PATH):
+    """Fold orders recorded in ``store`` since the shared snapshot was built into it; returns the snapshot."""
+    data = load_data(path, orders=store.order_counts)
+    counts = store.order_counts(after_id=data.order_watermark)
+    if counts is None:
+        # Compacted past the snapshot: count everything again
+        return reload_data(path, orders=store.order_counts)
+    if not len(counts):
+        return data
+    return update_data(path, expected=data, orders=counts, watermark=counts.attrs['last_id']) or data
+
+
+def _follow(store, path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            fold_new_orders(store, path)
+        except Exception:
+            logger.exception("Folding new orders into %s failed", path)
+
+
+_lock = threading.Lock()
+_followers = {}
+
+
+def follow_orders(store, path=DATA_PATH, interval=5.0):
+    """Fold new orders from ``store`` into the shared snapshot every ``interval`` seconds (one thread per path)."""
+    path = os.path.abspath(path)
+    with _lock:
+        thread = _followers.get(path)
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=_follow, args=(store, path, interval), name='foodans-orders',
+                                      daemon=True)
+            thread.start()
+            _followers[path] = thread
+        return thread
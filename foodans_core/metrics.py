@@ -0,0 +1,244 @@
+"""Opt-in timings and counters for the hot paths.
+
+Off unless the ``FOODANS_METRICS`` environment variable names an output file
+(or ``configure(path)`` is called).  When on:
+
+* ``timed(stage)`` (a context manager or decorator) records how long a stage
+  took, and ``scanned(n)`` adds ``n`` rows scanned to the innermost running
+  stage.  Every finished stage is logged as one JSON line on the
+  ``foodans_core.metrics`` logger;
+* ``count(name, **labels)`` bumps a counter, e.g. cache requests and misses;
+* everything is written to the file in Prometheus text format every
+  ``EXPORT_INTERVAL`` seconds (point a node_exporter textfile collector at
+  it), with stage timings as histograms so p95s can be computed;
+* ``start_profile()`` / ``stop_profile()`` wrap one rerun in cProfile and dump
+  the stats to ``FOODANS_PROFILE_DIR`` (default ``profiles/``).
+
+When off, every call is a cheap no-op.
+"""
+
+import atexit
+import contextlib
+import cProfile
+import io
+import itertools
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+
+METRICS_ENV = 'FOODANS_METRICS'
+PROFILE_DIR_ENV = 'FOODANS_PROFILE_DIR'
+
+EXPORT_INTERVAL = 10.0
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+enabled = False
+path = None
+
+_lock = threading.Lock()
+_local = threading.local()
+_histograms = {}  # stage -> [count per bucket..., +Inf count, sum]
+_counters = {}    # (name, sorted label items) -> value
+_exporter = None
+_profiles = itertools.count(1)
+
+
+def configure(out_path):
+    """Turn metrics on, writing the Prometheus file to ``out_path`` (None turns them off)."""
+    global enabled, path, _exporter
+    path = os.path.abspath(out_path) if out_path else None
+    enabled = path is not None
+    if not enabled:
+        return
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    with _lock:
+        if _exporter is None:
+            _exporter = threading.Thread(target=_export_loop, name='foodans-metrics', daemon=True)
+            _exporter.start()
+            atexit.register(export)
+
+
+# -- Recording -------------------------------------------------------------
+
+def start(stage, top=False):
+    """Start timing ``stage``; pass the result to ``stop``.  Stages nest per thread.
+
+    ``top=True`` first forgets stages this thread never stopped (a Streamlit
+    rerun can be abandoned midway by ``st.rerun()`` or ``st.stop()``).
+    """
+    if not enabled:
+        return None
+    token = [stage, time.perf_counter(), 0]
+    stack = _stack()
+    if top:
+        stack.clear()
+    stack.append(token)
+    return token
+
+
+def stop(token):
+    """Finish a stage started with ``start``; returns its duration in seconds."""
+    if token is None:
+        return None
+    stage, began, rows = token
+    elapsed = time.perf_counter() - began
+    stack = _stack()
+    if token in stack:
+        # Also drops inner stages an exception skipped
+        del stack[stack.index(token):]
+    if stack:
+        stack[-1][2] += rows  # a section's rows include its stages'
+    _observe(stage, elapsed)
+    logger.info(json.dumps({'ts': round(time.time(), 3), 'stage': stage, 'ms': round(elapsed * 1000, 3),
+                            'rows': rows, 'thread': threading.current_thread().name}))
+    return elapsed
+
+
+@contextlib.contextmanager
+def timed(stage):
+    """Time the ``with`` block (or, as a decorator, every call) as ``stage``."""
+    token = start(stage)
+    try:
+        yield
+    finally:
+        stop(token)
+
+
+def scanned(n):
+    """Count ``n`` rows scanned by the innermost running stage."""
+    if not enabled or not n:
+        return
+    stack = _stack()
+    stage = stack[-1][0] if stack else 'other'
+    if stack:
+        stack[-1][2] += int(n)
+    count('rows_scanned', int(n), stage=stage)
+
+
+def count(name, value=1, **labels):
+    """Add ``value`` to counter ``name`` (exported as ``foodans_<name>_total``)."""
+    if not enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def cache(name, hit):
+    """Count one lookup in cache ``name``."""
+    count('cache_requests', cache=name)
+    if not hit:
+        count('cache_misses', cache=name)
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _observe(stage, seconds):
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(BUCKETS)] += 1
+        hist[-1] += seconds
+
+
+# -- Export ----------------------------------------------------------------
+
+def _labels(items):
+    if not items:
+        return ''
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in items)
+    return '{' + ','.join(escaped) + '}'
+
+
+def prometheus_text():
+    """Everything recorded so far, in Prometheus text exposition format."""
+    with _lock:
+        histograms = {stage: list(h) for stage, h in _histograms.items()}
+        counters = dict(_counters)
+    lines = ['# HELP foodans_stage_seconds Time spent per section/stage.',
+             '# TYPE foodans_stage_seconds histogram']
+    for stage, hist in sorted(histograms.items()):
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ('+Inf',), hist):
+            cumulative += n
+            lines.append(f'foodans_stage_seconds_bucket{_labels([("stage", stage), ("le", bound)])} {cumulative}')
+        lines.append(f'foodans_stage_seconds_sum{_labels([("stage", stage)])} {hist[-1]:.6f}')
+        lines.append(f'foodans_stage_seconds_count{_labels([("stage", stage)])} {cumulative}')
+    names = sorted({name for name, _ in counters})
+    for name in names:
+        lines.append(f'# TYPE foodans_{name}_total counter')
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f'foodans_{name}_total{_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def export(out_path=None):
+    """Write ``prometheus_text()`` to ``out_path`` (default: the configured file) atomically."""
+    out_path = out_path or path
+    if not out_path:
+        return None
+    tmp = f'{out_path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(prometheus_text())
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def _export_loop():
+    while True:
+        time.sleep(EXPORT_INTERVAL)
+        try:
+            export()
+        except OSError:
+            logger.exception("Writing metrics to %s failed", path)
+
+
+# -- Profiling -------------------------------------------------------------
+
+def start_profile():
+    """Start profiling this thread with cProfile."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profile(profiler, name='rerun', top=30):
+    """Stop ``profiler``, dump its stats (``.prof`` plus a text summary) and return the ``.prof`` path."""
+    profiler.disable()
+    out_dir = os.environ.get(PROFILE_DIR_ENV, 'profiles')
+    os.makedirs(out_dir, exist_ok=True)
+    out = os.path.join(out_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_profiles)}.prof")
+    profiler.dump_stats(out)
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(top)
+    with open(out[:-len('.prof')] + '.txt', 'w') as f:
+        f.write(summary.getvalue())
+    return out
+
+
+configure(os.environ.get(METRICS_ENV))
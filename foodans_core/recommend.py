@@ -0,0 +1,279 @@
+"""Headless recommendation core.
+
+Every recommendation the Streamlit sections show is available here without
+Streamlit.  Each path comes in two flavours:
+
+* a single-request function (``top_vendors``, ``find_food``, ``next_meals``,
+  ``similar_items``, ``search_menu``) that answers one click from the
+  pre-built index, vendor summary, similarity engine and search index;
+* a ``*_batch`` function that takes a DataFrame of requests (one row per
+  user: area, diet, category, price band, rating band) and answers all of them
+  with grouped/merged pandas operations, for nightly precomputation.
+
+Batch results are long DataFrames with a ``request`` column holding the
+request's index label.
+
+Usage: ``python -m foodans_core.recommend --out recommendations/``
+"""
+
+import argparse
+import os
+from dataclasses import dataclass
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from foodans_core.similarity import MISSING
+from foodans_core.vendors import TOP_N
+
+INF = float('inf')
+
+# UI labels -> inclusive (low, high) bounds
+PRICE_BANDS = {
+    "0-50": (0, 50),
+    "51-100": (51, 100),
+    "101-150": (101, 150),
+    "151+": (151, INF),
+    "Any Price": (0, INF),
+}
+RATING_BANDS = {
+    "3.0-3.5": (3.0, 3.5),
+    "3.5-4.0": (3.5, 4.0),
+    "4.0-4.5": (4.0, 4.5),
+    "4.5 and above": (4.5, INF),
+}
+DIETS = ['Both', 'Veg', 'Non-Veg']
+
+# Columns carried into batch results
+ITEM_COLUMNS = ['Name', 'Item_Name', 'Type', 'Area', 'Food_Type', 'Price', 'Avg_Rating', 'Total_Order', 'Score']
+
+
+@dataclass
+class FoodMatches:
+    """Result of one "Find My Food!" search."""
+
+    matches: pd.DataFrame      # best items per vendor, vendors in first-appearance order
+    top_item: pd.Series = None  # best match overall (None when nothing matched)
+    similar: pd.DataFrame = None  # look-alikes of top_item, or alternatives when nothing matched
+
+
+# -- Single requests -------------------------------------------------------
+
+def top_vendors(data, area, diet='Both', k=5, items=3):
+    """``[(vendor, items_df), ...]`` for the ``k`` best vendors in ``area`` by mean Score."""
+    df, vendors = data.df, data.vendors
+    return [(vendor, df.iloc[vendors.top_items(vendor, diet, area=area, by='Score', k=items)])
+            for vendor in vendors.top_vendors(area, diet, k=k)]
+
+
+def category_alternatives(data, category, diet='Both', k=3):
+    """Items similar to the first ``category`` item for ``diet``; None if there is no such item."""
+    rows = data.index.top(type_=category, diet=diet, by=None)
+    if not len(rows):
+        return None
+    return similar_items(data, rows[0], k=k, category=category, diet=diet, exclude_self=False)
+
+
+def find_food(data, area, category, diet='Both', price=(0, INF), rating=(0, INF), per_vendor=4, k_similar=3):
+    """Items of ``category`` in ``area`` within the price/rating bands, plus similar picks."""
+    df = data.df
+    filtered = df.iloc[data.index.top(area=area, type_=category, diet=diet, price=price, rating=rating, by=None)]
+    if filtered.empty:
+        return FoodMatches(filtered, None, category_alternatives(data, category, diet, k=2))
+
+    vendor_order = pd.factorize(filtered['Name'])[0]
+    ranked = filtered.assign(_vendor=vendor_order).sort_values(['_vendor', 'Score'], ascending=[True, False],
+                                                               kind='stable')
+    matches = ranked.groupby('_vendor', sort=False).head(per_vendor).drop(columns='_vendor')
+    top_item = filtered.sort_values('Score', ascending=False, kind='stable').iloc[0]
+    similar = similar_items(data, top_item.name, k=k_similar, category=category, diet=diet)
+    return FoodMatches(matches, top_item, similar)
+
+
+def next_meals(data, category, area, diet='Both'):
+    """Up to three distinct dishes of the types that usually follow ``category`` (see ``transitions``)."""
+    return data.df.iloc[data.transitions.get(category, area, diet)]
+
+
+def similar_items(data, position, k=3, category=None, diet='Both', exclude_self=True):
+    """Rows most similar to row ``position`` within ``category`` and ``diet``."""
+    return data.df.iloc[data.similar.neighbors_of(position, k=k, type_=category, diet=diet,
+                                                  exclude_self=exclude_self)]
+
+
+def search_menu(data, query, diet='Both', k=10):
+    """Menu rows best matching the free-text ``query`` (typos allowed), best first."""
+    return data.df.iloc[data.search.search(query, k=k, diet=diet)]
+
+
+def search_vendors(data, query, k=20):
+    """Names of vendors whose name, dishes, categories or areas match ``query``, best match first."""
+    rows = data.search.search(query, k=k * TOP_N)
+    return list(dict.fromkeys(data.df['Name'].iloc[rows]))[:k]
+
+
+# -- Batches ---------------------------------------------------------------
+
+def _requests(requests, defaults):
+    requests = pd.DataFrame(requests).copy()
+    for col, value in defaults.items():
+        if col not in requests:
+            requests[col] = value
+    requests['request'] = requests.index
+    return requests.reset_index(drop=True)
+
+
+def _diet_ok(food_type, diet):
+    return (diet == 'Both') | (food_type == diet)
+
+
+def _items(data):
+    return data.df[ITEM_COLUMNS].assign(row=np.arange(len(data.df)))
+
+
+def top_vendors_batch(data, requests, k=5, items=3):
+    """Top vendors and their best items for every ``(area, diet)`` request.
+
+    Returns one row per item with ``request``, ``vendor_rank`` and ``item_rank``.
+    """
+    requests = _requests(requests, {'diet': 'Both'})
+    items_df = _items(data)
+    tables = []
+    for diet in requests['diet'].unique():
+        sub = items_df if diet == 'Both' else items_df[items_df['Food_Type'] == diet]
+        vendors = (sub.assign(_first=np.arange(len(sub)))
+                   .groupby(['Area', 'Name'], sort=False, observed=True)
+                   .agg(avg_score=('Score', 'mean'), _first=('_first', 'min'))
+                   .reset_index()
+                   .sort_values('_first', kind='stable')
+                   .sort_values('avg_score', ascending=False, kind='stable'))
+        vendors['vendor_rank'] = vendors.groupby('Area', observed=True).cumcount()
+        vendors = vendors[vendors['vendor_rank'] < k]
+
+        best = sub.sort_values('Score', ascending=False, kind='stable')
+        best = best.assign(item_rank=best.groupby(['Area', 'Name'], observed=True).cumcount())
+        best = best[best['item_rank'] < items]
+        table = vendors[['Area', 'Name', 'vendor_rank']].merge(best, on=['Area', 'Name'])
+        reqs = requests.loc[requests['diet'] == diet, ['request', 'area', 'diet']]
+        tables.append(reqs.merge(table, left_on='area', right_on='Area'))
+    result = pd.concat(tables, ignore_index=True)
+    return result.sort_values(['request', 'vendor_rank', 'item_rank'], kind='stable').reset_index(drop=True)
+
+
+def find_food_batch(data, requests, per_vendor=4, k_similar=3, chunk_size=5000):
+    """Answer many "Find My Food!" searches at once.
+
+    ``requests`` needs ``area`` and ``category`` columns and may carry
+    ``diet`` and ``price_min``/``price_max``/``rating_min``/``rating_max``.
+    Returns matched items (``kind == 'match'``, at most ``per_vendor`` per
+    vendor), look-alikes of each request's best match (``kind == 'similar'``)
+    and, for requests with no match, category alternatives
+    (``kind == 'alternative'``).
+    """
+    requests = _requests(requests, {'diet': 'Both', 'price_min': 0, 'price_max': INF,
+                                    'rating_min': 0, 'rating_max': INF})
+    items_df = _items(data)
+    parts = []
+    for start in range(0, len(requests), chunk_size):
+        reqs = requests.iloc[start:start + chunk_size]
+        joined = reqs.merge(items_df, left_on=['area', 'category'], right_on=['Area', 'Type'])
+        keep = (_diet_ok(joined['Food_Type'], joined['diet'])
+                & joined['Price'].between(joined['price_min'], joined['price_max'])
+                & joined['Avg_Rating'].between(joined['rating_min'], joined['rating_max']))
+        joined = joined[keep].sort_values(['request', 'Score'], ascending=[True, False], kind='stable')
+        joined = joined[joined.groupby(['request', 'Name'], observed=True).cumcount() < per_vendor]
+        parts.append(joined.assign(kind='match'))
+
+    matched = pd.concat(parts, ignore_index=True) if parts else requests.iloc[:0]
+    request_cols = ['request', 'area', 'category', 'diet']
+    results = [matched]
+
+    if k_similar and len(matched):
+        # Rows are sorted by Score within each request, so the first one is its top item
+        tops = matched.drop_duplicates('request')[request_cols + ['row']].rename(columns={'row': 'query'})
+        for (category, diet), group in tops.groupby(['category', 'diet'], sort=False, observed=True):
+            found = similar_items_batch(data, group['query'].unique(), k=k_similar, category=category, diet=diet)
+            results.append(group.merge(found, on='query').assign(kind='similar'))
+
+    empty = requests[~requests['request'].isin(matched['request'])]
+    # Every request for the same (category, diet) shares one set of alternatives
+    for (category, diet), reqs in empty.groupby(['category', 'diet'], sort=False, observed=True):
+        alt = category_alternatives(data, category, diet, k=2)
+        if alt is not None and not alt.empty:
+            alt = alt[ITEM_COLUMNS].assign(row=alt.index.to_numpy())
+            results.append(reqs[request_cols].merge(alt, how='cross').assign(kind='alternative'))
+
+    result = pd.concat(results, ignore_index=True)
+    return result.sort_values('request', kind='stable').reset_index(drop=True)
+
+
+def next_meals_batch(data, requests):
+    """``next_meals`` for every ``(category, area, diet)`` request, joined from the transition table."""
+    requests = _requests(requests, {'diet': 'Both'})
+    table = data.transitions.to_frame()
+    recs = requests[['request', 'category', 'area', 'diet']].merge(table, on=['category', 'area', 'diet'])
+    recs = recs.merge(_items(data), on='row')
+    return recs.sort_values(['request', 'rank'], kind='stable').reset_index(drop=True)
+
+
+def similar_items_batch(data, positions, k=3, category=None, diet='Both', exclude_self=True):
+    """Neighbours of many rows at once: one row per (query position, rank)."""
+    positions = np.asarray(positions, dtype=np.intp)
+    nbrs = data.similar.similar(positions, k=k, type_=category, diet=diet, exclude_self=exclude_self)
+    query = np.repeat(positions, k)
+    rank = np.tile(np.arange(k), len(positions))
+    flat = nbrs.ravel()
+    valid = flat != MISSING
+    found = _items(data).iloc[flat[valid]].reset_index(drop=True)
+    return found.assign(query=query[valid], rank=rank[valid])
+
+
+# -- Nightly precompute ----------------------------------------------------
+
+def all_requests(data):
+    """Every combination the UI can ask for."""
+    index = data.index
+    vendor_reqs = pd.DataFrame(list(product(index.areas, DIETS)), columns=['area', 'diet'])
+    food_reqs = pd.DataFrame(
+        [(a, c, d, *PRICE_BANDS[p], *RATING_BANDS[r], p, r)
+         for a, c, d, p, r in product(index.areas, index.types, DIETS, PRICE_BANDS, RATING_BANDS)],
+        columns=['area', 'category', 'diet', 'price_min', 'price_max', 'rating_min', 'rating_max',
+                 'price_band', 'rating_band'])
+    next_reqs = pd.DataFrame(list(product(index.types, index.areas, DIETS)), columns=['category', 'area', 'diet'])
+    return vendor_reqs, food_reqs, next_reqs
+
+
+def precompute(data, out_dir):
+    """Write top-vendor, find-food and next-meal tables for every combination to ``out_dir``."""
+    os.makedirs(out_dir, exist_ok=True)
+    vendor_reqs, food_reqs, next_reqs = all_requests(data)
+    tables = {
+        'requests_top_vendors': vendor_reqs,
+        'requests_find_food': food_reqs,
+        'requests_next_meals': next_reqs,
+        'top_vendors': top_vendors_batch(data, vendor_reqs),
+        'find_food': find_food_batch(data, food_reqs),
+        'next_meals': next_meals_batch(data, next_reqs),
+    }
+    written = []
+    for name, table in tables.items():
+        path = os.path.join(out_dir, f'{name}.csv')
+        table.to_csv(path, index=False)
+        written.append(path)
+    return written
+
+
+def main(argv=None):
+    from foodans_core.data import DATA_PATH, load_data
+
+    parser = argparse.ArgumentParser(description="Precompute recommendations for every UI combination.")
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--out', default='recommendations')
+    args = parser.parse_args(argv)
+    for path in precompute(load_data(args.data), args.out):
+        print(f"Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
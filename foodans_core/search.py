@@ -0,0 +1,421 @@
+"""Typo-tolerant text search over dishes, vendors, categories and areas.
+
+The index is built over the distinct values of ``SEARCH_FIELDS`` (the
+categorical labels), not over rows, so a million-row menu with a few thousand
+distinct names costs a few thousand index entries.  Each value is split into
+lower-case ASCII words ("Café" -> "cafe").  A query word matches a word of
+the vocabulary
+
+* by prefix, via binary search on the sorted vocabulary ("bir" -> "biryani");
+* by fuzzy prefix: a word whose start is within ``typos(len(q))`` edits of
+  the query word ("biri" -> "biryani", "biriyani" -> "biryani"), so results
+  do not vanish while a misspelt word is still being typed.  Candidates come
+  from an inverted index from trigrams to words, and are checked with an edit
+  distance computed for all of them at once.
+
+Rows are then ranked by ``MATCH_WEIGHT * match + PHRASE_WEIGHT * phrase +
+Score``, where ``match`` averages each query word's best field-weighted
+similarity in the row and ``phrase`` rewards a value that spells out the whole
+query (fully, or as a run of its words), so typing a vendor's exact name finds
+that vendor before busier ones sharing some of its words.  Every query word
+that matches anything must match the row.
+
+If the rows of the most selective query word are few, they are fetched and
+ranked directly.  Otherwise rows are scanned in Score order, and the scan stops
+as soon as no unseen row can beat the current top ``k``.  The
+per-keystroke cost is therefore bounded by how selective the query is, not
+by the size of the menu.
+"""
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+from foodans_core import metrics
+from foodans_core.index import diet_food_type, label_codes
+
+# Searched columns and how much a match in each counts
+SEARCH_FIELDS = {'Item_Name': 1.0, 'Name': 0.9, 'Category': 0.7, 'Area': 0.7}
+
+# Text match (0-1) against Score (about 0-3.4) in the final ranking
+MATCH_WEIGHT = 2.0
+
+# Bonus for a value equal to the whole query (times the field's weight), and
+# the fraction of it for a value containing the query as a phrase
+PHRASE_WEIGHT = 2.0
+PHRASE_PART = 0.5
+
+# A typo match counts this much of an exact one
+FUZZY_WEIGHT = 0.9
+
+# Most vocabulary words (those sharing the most trigrams) checked for typos per query word
+FUZZY_CANDIDATES = 1000
+
+# Fetch the matching rows directly when the most selective word has at most this many
+GATHER_LIMIT = 20_000
+
+_WORD = re.compile(r'[a-z0-9]+')
+_EMPTY = np.empty(0, dtype=np.intp)
+
+
+def words(text):
+    """Lower-case ASCII words of ``text`` (accents folded, emoji and punctuation dropped)."""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode().lower()
+    return _WORD.findall(text)
+
+
+def typos(n):
+    """Edits allowed in a query word of ``n`` letters: none below 4, one below 8, else two."""
+    return 0 if n < 4 else 1 if n < 8 else 2
+
+
+def _trigrams(word):
+    # Only the start is padded, so a word shares its trigrams with its prefixes
+    padded = f'  {word}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _spans(starts, counts):
+    """Concatenated ranges ``starts[i]:starts[i] + counts[i]``, as one index array."""
+    total = int(counts.sum())
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+
+
+class SearchIndex:
+    """Inverted word/trigram index over the menu's names, plus per-value row lists.
+
+    The index is built by the first search (or ``updated``), not when the
+    data is loaded.
+    """
+
+    def __init__(self, df):
+        self._df = df
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _build(self):
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            with metrics.timed('build.search'):
+                df = self._df
+                self._vocabulary(df)
+                self._columns(df)
+                self._by_score = np.lexsort((np.arange(len(df)), -self._score)).astype(np.intp)
+            self._ready = True
+
+    def _vocabulary(self, df):
+        # One entry per value of each field, field after field, so entry
+        # field_start[f] + c is value c of field f
+        self._field_start = [0]
+        entry_text, entry_weight, word_ids, pairs = [], [], {}, []
+        for field, weight in SEARCH_FIELDS.items():
+            _, labels = label_codes(df[field])
+            for label in labels:
+                found = words(label)
+                entry_text.append(f" {' '.join(found)} ")
+                found = set(found)
+                # A word is a weaker match for a longer name
+                entry_weight.append(weight * (0.75 + 0.25 / len(found)) if found else 0.0)
+                pairs.extend((word_ids.setdefault(w, len(word_ids)), len(entry_weight) - 1) for w in found)
+            self._field_start.append(len(entry_weight))
+
+        # Sorted vocabulary, so every prefix is one contiguous id range
+        self._words = sorted(word_ids)
+        rank = np.empty(len(word_ids), dtype=np.intp)
+        rank[[word_ids[w] for w in self._words]] = np.arange(len(word_ids))
+        self._word_len = np.fromiter((len(w) for w in self._words), dtype=np.intp, count=len(self._words))
+        # One row of ASCII codes per word, zero-padded
+        width = max(1, int(self._word_len.max(initial=0)))
+        self._word_chars = np.array(self._words, dtype=f'S{width}').view(np.uint8).reshape(-1, width)
+
+        pairs = np.array(pairs, dtype=np.intp).reshape(-1, 2)
+        word_of = rank[pairs[:, 0]]
+        order = np.argsort(word_of, kind='stable')
+        self._word_entries = pairs[order, 1]
+        self._word_offsets = np.zeros(len(self._words) + 1, dtype=np.intp)
+        np.cumsum(np.bincount(word_of, minlength=len(self._words)), out=self._word_offsets[1:])
+        self._entry_weight = np.array(entry_weight)
+        self._entry_text = np.array(entry_text)  # words joined by spaces, space-padded
+
+        grams = {}
+        for i, w in enumerate(self._words):
+            for g in _trigrams(w):
+                grams.setdefault(g, []).append(i)
+        self._grams = {g: np.array(ids, dtype=np.intp) for g, ids in grams.items()}
+
+    def _columns(self, df):
+        self._score = df['Score'].to_numpy()
+        self._food_codes, food_labels = label_codes(df['Food_Type'])
+        self._food_labels = list(food_labels)
+        n_food = len(food_labels)
+        self._codes, self._by_code, self._offsets = [], [], []
+        for field in SEARCH_FIELDS:
+            codes, labels = label_codes(df[field])
+            self._codes.append(codes)
+            # Rows grouped by (value, Food_Type): group g = value * n_food + food
+            # is by_code[offsets[g]:offsets[g + 1]], and a value's groups are adjacent
+            groups = codes.astype(np.intp) * n_food + self._food_codes
+            self._by_code.append(np.argsort(groups, kind='stable'))
+            offsets = np.zeros(len(labels) * n_food + 1, dtype=np.intp)
+            np.cumsum(np.bincount(groups, minlength=len(labels) * n_food), out=offsets[1:])
+            self._offsets.append(offsets)
+
+    def updated(self, df, rows):
+        """Index for ``df`` where only ``rows`` changed Score or were appended.
+
+        Those rows are moved within the Score order.  Appended rows with a
+        name (dish, vendor, category or area) the index has not seen rebuild
+        the index; ``df`` must keep every existing row at its position.
+        """
+        if not self._ready:
+            return SearchIndex(df)
+        n_old = len(self._score)
+        sizes = np.diff(self._field_start)
+        if len(df) < n_old or any(len(label_codes(df[field])[1]) != n for field, n in zip(SEARCH_FIELDS, sizes)):
+            return SearchIndex(df)
+        new = SearchIndex.__new__(SearchIndex)
+        new.__dict__.update(self.__dict__)
+        new._df = df
+        new._lock = threading.Lock()
+        rows = np.asarray(rows, dtype=np.intp)
+        if len(df) > n_old:
+            new._columns(df)
+            rows = np.concatenate([rows, np.arange(n_old, len(df))])
+        else:
+            new._score = df['Score'].to_numpy()
+        rows = np.unique(rows)
+        if 8 * len(rows) >= len(df):
+            new._by_score = np.lexsort((np.arange(len(df)), -new._score)).astype(np.intp)
+        elif len(rows):
+            moved = np.zeros(len(df), dtype=bool)
+            moved[rows] = True
+            kept = self._by_score[~moved[self._by_score]]
+            rows = rows[np.lexsort((rows, -new._score[rows]))]
+            kept_score = -new._score[kept]
+            at = np.searchsorted(kept_score, -new._score[rows], side='left')
+            tied = at < len(kept)
+            tied[tied] = kept_score[at[tied]] == -new._score[rows[tied]]
+            if tied.any():
+                # Equal Scores stay in row order: number the runs of equal
+                # Score and place each tied row by (run, row)
+                run = np.cumsum(np.concatenate([[0], kept_score[1:] != kept_score[:-1]]))
+                key = run * len(df) + kept
+                at[tied] = np.searchsorted(key, run[at[tied]] * len(df) + rows[tied])
+            new._by_score = np.insert(kept, at, rows)
+        return new
+
+    # -- Queries -----------------------------------------------------------
+
+    def _similar_words(self, q):
+        """Vocabulary word ids matching query word ``q`` and their similarity."""
+        ids, sims = [], []
+        lo = bisect_left(self._words, q)
+        hi = bisect_left(self._words, q + '{', lo)  # '{' sorts after every [a-z0-9]
+        if hi > lo:
+            ids.append(np.arange(lo, hi))
+            sims.append(0.5 + 0.5 * len(q) / self._word_len[lo:hi])
+        edits = typos(len(q))
+        if edits:
+            grams = _trigrams(q)
+            posted = [self._grams[g] for g in grams if g in self._grams]
+            if posted:
+                hit, shared = np.unique(np.concatenate(posted), return_counts=True)
+                # One edit changes at most three trigrams
+                keep = shared >= len(grams) - 3 * edits
+                hit, shared = hit[keep], shared[keep]
+                if len(hit) > FUZZY_CANDIDATES:
+                    hit = hit[np.argsort(-shared, kind='stable')[:FUZZY_CANDIDATES]]
+                dist = self._prefix_distance(q, hit, edits)
+                keep = dist <= edits
+                hit, dist = hit[keep], dist[keep]
+                ids.append(hit)
+                sims.append(FUZZY_WEIGHT * (1 - dist / len(q)) * (0.5 + 0.5 * np.minimum(1, len(q) / self._word_len[hit])))
+        if not ids:
+            return _EMPTY, np.empty(0)
+        return np.concatenate(ids), np.concatenate(sims)
+
+    def _prefix_distance(self, q, ids, edits):
+        """Edit distance from ``q`` to the closest prefix of each word in ``ids`` (Levenshtein, one column per word)."""
+        width = min(len(q) + edits, self._word_chars.shape[1])
+        chars = self._word_chars[ids, :width]
+        lengths = self._word_len[ids]
+        # prev[:, j]: distance from the query so far to the word's first j letters
+        prev = np.broadcast_to(np.arange(width + 1), (len(ids), width + 1)).copy()
+        for i, c in enumerate(q.encode(), 1):
+            cur = np.empty_like(prev)
+            cur[:, 0] = i
+            differs = chars != c
+            for j in range(1, width + 1):
+                cur[:, j] = np.minimum(np.minimum(prev[:, j], cur[:, j - 1]) + 1, prev[:, j - 1] + differs[:, j - 1])
+            prev = cur
+        # Prefixes longer than the word do not exist
+        prev[np.arange(width + 1) > lengths[:, None]] = width + len(q)
+        return prev.min(axis=1)
+
+    def _value_scores(self, q, food=None):
+        """Per field, the match of every value for query word ``q`` (None if nothing matched).
+
+        Also returns how many rows (of Food_Type code ``food``) have a matching value.
+        """
+        ids, sims = self._similar_words(q)
+        if not len(ids):
+            return None, 0
+        starts = self._word_offsets[ids]
+        counts = self._word_offsets[ids + 1] - starts
+        entries = self._word_entries[_spans(starts, counts)]
+        values = np.zeros(len(self._entry_weight))
+        np.maximum.at(values, entries, np.repeat(sims, counts) * self._entry_weight[entries])
+        bounds = self._field_start
+        hit = np.searchsorted(bounds, entries, side='right') - 1
+        hit = np.bincount(hit, minlength=len(SEARCH_FIELDS))
+        per_field = [values[bounds[f]:bounds[f + 1]] if hit[f] else None for f in range(len(SEARCH_FIELDS))]
+        return per_field, self._count(per_field, food)
+
+    def _phrase_scores(self, query_words):
+        """Per field, the phrase bonus of every value for the whole query (None if no value earns one)."""
+        ids = []
+        for q in set(query_words):
+            i = bisect_left(self._words, q)
+            if i == len(self._words) or self._words[i] != q:
+                return None  # no value has this exact word
+            ids.append(i)
+        # Only values with every query word can contain the query: check those of the rarest one
+        i = min(ids, key=lambda i: self._word_offsets[i + 1] - self._word_offsets[i])
+        entries = self._word_entries[self._word_offsets[i]:self._word_offsets[i + 1]]
+        texts = self._entry_text[entries]
+        phrase = f" {' '.join(query_words)} "
+        exact = texts == phrase
+        # Every value with a one-word query's word contains it as a phrase
+        part = ~exact if len(query_words) == 1 else ~exact & (np.char.find(texts, phrase) >= 0)
+        bonus = np.where(exact, 1.0, np.where(part, PHRASE_PART, 0.0))
+        if not bonus.any():
+            return None
+        values = np.zeros(len(self._entry_weight))
+        values[entries] = bonus
+        bounds = self._field_start
+        per_field = [values[bounds[f]:bounds[f + 1]] * weight for f, weight in enumerate(SEARCH_FIELDS.values())]
+        return [field if field.any() else None for field in per_field]
+
+    def _groups(self, f, values, food):
+        """Start and length of the row run of every matched value of field ``f`` (for one Food_Type code, or all)."""
+        n_food = len(self._food_labels)
+        first = np.flatnonzero(values) * n_food
+        if food is None:
+            starts, ends = self._offsets[f][first], self._offsets[f][first + n_food]
+        else:
+            starts, ends = self._offsets[f][first + food], self._offsets[f][first + food + 1]
+        return starts, ends - starts
+
+    def _count(self, per_field, food):
+        """How many rows (of Food_Type code ``food``) have a matched value."""
+        return sum(int(self._groups(f, values, food)[1].sum())
+                   for f, values in enumerate(per_field) if values is not None)
+
+    def _rows(self, per_field, food):
+        parts = [self._by_code[f][_spans(*self._groups(f, values, food))]
+                 for f, values in enumerate(per_field) if values is not None]
+        return np.unique(np.concatenate(parts)) if parts else _EMPTY
+
+    def _field_best(self, per_field, rows):
+        """Best value score of each of ``rows`` across the fields."""
+        best = np.zeros(len(rows))
+        for f, values in enumerate(per_field):
+            if values is not None:
+                np.maximum(best, values[self._codes[f][rows]], out=best)
+        return best
+
+    def _rank(self, rows, matched, phrase, food):
+        """The ``rows`` matching every query word (and the diet), and their rank."""
+        if food is not None:
+            rows = rows[self._food_codes[rows] == food]
+        match = np.zeros(len(rows))
+        # Most selective word first, so the others look at fewer rows
+        for per_field in matched:
+            best = self._field_best(per_field, rows)
+            ok = best > 0
+            rows, match = rows[ok], match[ok] + best[ok]
+        rank = MATCH_WEIGHT * match / len(matched) + self._score[rows]
+        if phrase is not None:
+            rank += PHRASE_WEIGHT * self._field_best(phrase, rows)
+        return rows, rank
+
+    @metrics.timed('search')
+    def search(self, query, k=10, diet='Both'):
+        """Row positions of the ``k`` best matches for ``query`` (best first)."""
+        self._build()
+        food = diet_food_type(diet)
+        if food is not None:
+            if food not in self._food_labels:
+                return _EMPTY
+            food = self._food_labels.index(food)
+        query_words = words(query)
+        matched = []
+        # Words that match no name at all are ignored
+        for q in dict.fromkeys(query_words):
+            per_field, n_rows = self._value_scores(q, food)
+            if per_field is not None:
+                if not n_rows:
+                    return _EMPTY  # no row of this diet can match the word
+                matched.append((per_field, n_rows))
+        if not matched:
+            return _EMPTY
+        matched.sort(key=lambda m: m[1])
+        n_rows = matched[0][1]
+        matched = [per_field for per_field, _ in matched]
+        phrase = self._phrase_scores(query_words)
+        if n_rows <= GATHER_LIMIT:
+            rows = self._rows(matched[0], food)
+            metrics.scanned(len(rows))
+            return self._best(*self._rank(rows, matched, phrase, None), k)
+        if phrase is not None and self._count(phrase, food) <= GATHER_LIMIT:
+            boosted = self._rows(phrase, food)
+            metrics.scanned(len(boosted))
+            # Rank the rows with a phrase bonus directly, and scan the rest without
+            # the bonus in the ceiling (which would delay the stop)
+            skip = np.zeros(len(self._score), dtype=bool)
+            skip[boosted] = True
+            rest = self._scan(matched, None, food, k, skip)
+            boosted, boosted_rank = self._rank(boosted, matched, phrase, None)
+            rest, rest_rank = self._rank(rest, matched, None, None)
+            return self._best(np.concatenate([boosted, rest]), np.concatenate([boosted_rank, rest_rank]), k)
+        return self._scan(matched, phrase, food, k)
+
+    def _scan(self, matched, phrase, food, k, skip=None):
+        # Best possible match of an unseen row
+        ceiling = MATCH_WEIGHT * np.mean([max(v.max() for v in per_field if v is not None)
+                                          for per_field in matched])
+        if phrase is not None:
+            ceiling += PHRASE_WEIGHT * max(v.max() for v in phrase if v is not None)
+        found_rows, found_rank = _EMPTY, np.empty(0)
+        start, chunk, n = 0, 1024, len(self._by_score)
+        while start < n:
+            rows = self._by_score[start:start + chunk]
+            start += chunk
+            if skip is not None:
+                rows = rows[~skip[rows]]
+            rows, rank = self._rank(rows, matched, phrase, food)
+            found_rows = np.concatenate([found_rows, rows])
+            found_rank = np.concatenate([found_rank, rank])
+            if len(found_rows) > k:
+                keep = self._order(found_rows, found_rank)[:k]
+                found_rows, found_rank = found_rows[keep], found_rank[keep]
+            if len(found_rows) >= k and start < n and found_rank.min() > ceiling + self._score[self._by_score[start]]:
+                break
+            chunk = min(chunk * 2, 65536)
+        metrics.scanned(min(start, n))
+        return self._best(found_rows, found_rank, k)
+
+    @staticmethod
+    def _order(rows, rank):
+        # Ties keep row order so results are deterministic
+        return np.lexsort((rows, -rank))
+
+    def _best(self, rows, rank, k):
+        return rows[self._order(rows, rank)[:k]]
+
@@ -0,0 +1,214 @@
+"""Feature-scaled, constraint-aware item similarity.
+
+The old single ``NearestNeighbors`` model ran on raw ``Price`` /
+``Avg_Rating`` / ``Food_Type`` (so price swamped everything else) and the diet
+and category filters were applied after fetching a handful of neighbours,
+which often left nothing.  Here features are standardised and every
+(Type, Food_Type) constraint gets its own sub-index, fitted on first use, so a
+constrained query always returns ``k`` valid items when the slice has them.
+
+Deltas (see ``ingest``) do not refit anything: a fitted sub-index keeps
+serving its rows, rows added or re-priced since are searched brute-force
+from a small buffer, and the sub-index is refitted lazily once that buffer
+outgrows ``DELTA_LIMIT`` / ``DELTA_FRACTION`` of it.  The feature scaling
+stays the one fitted on the full load.
+"""
+
+import threading
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+from foodans_core import metrics
+from foodans_core.index import diet_food_type
+
+FEATURES = ('Price', 'Avg_Rating', 'Food_Type')
+
+# Padding for neighbour slots a too-small slice cannot fill
+MISSING = -1
+
+# Refit a sub-index once more than max(DELTA_LIMIT, DELTA_FRACTION * size)
+# of its rows were added or changed since it was fitted
+DELTA_LIMIT = 1024
+DELTA_FRACTION = 0.05
+
+_EMPTY = np.empty(0, dtype=np.intp)
+
+
+def feature_matrix(df):
+    """Raw (unscaled) feature matrix, one row per item."""
+    return np.column_stack([
+        df['Price'].to_numpy(dtype=float),
+        df['Avg_Rating'].to_numpy(dtype=float),
+        (df['Food_Type'] == 'Non-Veg').to_numpy(dtype=float),
+    ])
+
+
+def _slice_rows(df, offset=0):
+    """Row positions (shifted by ``offset``) per (Type|None, Food_Type|None) key, except (None, None)."""
+    slices = {}
+    for keys, cols in (((0, 1), ['Type', 'Food_Type']), ((0,), ['Type']), ((1,), ['Food_Type'])):
+        for key, rows in df.groupby(cols, sort=False, observed=True).indices.items():
+            key = key if isinstance(key, tuple) else (key,)
+            full = [None, None]
+            for slot, value in zip(keys, key):
+                full[slot] = value
+            slices[tuple(full)] = np.asarray(rows, dtype=np.intp) + offset
+    return slices
+
+
+class _SliceModel:
+    """A fitted sub-index plus the rows that changed or arrived after it was fitted."""
+
+    __slots__ = ('model', 'rows', 'stale', 'extra', 'extra_model')
+
+    def __init__(self, model, rows, stale=None, extra=_EMPTY, extra_model=None):
+        self.model = model
+        self.rows = rows          # positions the model was fitted on
+        self.stale = stale        # bool per fitted row: features changed since (None: nothing changed)
+        self.extra = extra        # positions searched brute-force instead
+        self.extra_model = extra_model
+
+    def kneighbors(self, X, n):
+        if self.stale is None and not len(self.extra):
+            _, nbrs = self.model.kneighbors(X, n_neighbors=n)
+            return self.rows[nbrs]
+        n_stale = 0 if self.stale is None else int(self.stale.sum())
+        dist, nbrs = self.model.kneighbors(X, n_neighbors=min(n + n_stale, len(self.rows)))
+        if n_stale:
+            dist[self.stale[nbrs]] = np.inf
+        found = self.rows[nbrs]
+        if len(self.extra):
+            extra_dist, extra_nbrs = self.extra_model.kneighbors(X, n_neighbors=min(n, len(self.extra)))
+            dist = np.hstack([dist, extra_dist])
+            found = np.hstack([found, self.extra[extra_nbrs]])
+        order = np.argsort(dist, axis=1, kind='stable')[:, :n]
+        return np.take_along_axis(found, order, axis=1)
+
+    def updated(self, X, changed, added):
+        """This model for features ``X`` after ``changed`` rows moved and ``added`` rows joined; None to refit."""
+        if not len(changed) and not len(added):
+            return self
+        stale = np.isin(self.rows, changed)
+        if self.stale is not None:
+            stale |= self.stale
+        extra = np.union1d(np.union1d(self.extra, self.rows[stale]), added)
+        if len(extra) > max(DELTA_LIMIT, DELTA_FRACTION * len(self.rows)):
+            return None
+        extra_model = NearestNeighbors(algorithm='brute').fit(X[extra]) if len(extra) else None
+        return _SliceModel(self.model, self.rows, stale if stale.any() else None, extra, extra_model)
+
+
+class SimilarityEngine:
+    """Nearest neighbours over standardised features, per (Type, Food_Type) constraint."""
+
+    def __init__(self, df):
+        raw = feature_matrix(df)
+        self.mean = raw.mean(axis=0)
+        std = raw.std(axis=0)
+        self.scale = np.where(std > 0, std, 1.0)
+        self._X = (raw - self.mean) / self.scale
+
+        self._slices = {(None, None): np.arange(len(df)), **_slice_rows(df)}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def transform(self, raw):
+        """Scale a raw feature matrix (see ``feature_matrix``) into model space."""
+        return (np.asarray(raw, dtype=float) - self.mean) / self.scale
+
+    def _model(self, key):
+        model = self._models.get(key)
+        metrics.cache('knn', hit=model is not None)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    rows = self._slices[key]
+                    with metrics.timed('knn.fit'):
+                        metrics.scanned(len(rows))
+                        model = _SliceModel(NearestNeighbors().fit(self._X[rows]), rows)
+                    self._models[key] = model
+        return model
+
+    def updated(self, df, changed=()):
+        """Engine for ``df``: this data with ``changed`` rows re-priced and new rows appended.
+
+        Fitted sub-indexes are carried over with a delta buffer (see the
+        module docstring); ``df`` must keep every existing row at its position.
+        """
+        n_old = len(self._X)
+        changed = np.unique(np.asarray(changed, dtype=np.intp))
+        new = SimilarityEngine.__new__(SimilarityEngine)
+        new.mean, new.scale = self.mean, self.scale
+        new._X = self._X.copy()
+        if len(changed):
+            new._X[changed] = self.transform(feature_matrix(df.iloc[changed]))
+        added = np.arange(n_old, len(df), dtype=np.intp)
+        if len(added):
+            new._X = np.vstack([new._X, self.transform(feature_matrix(df.iloc[n_old:]))])
+
+        new._slices = dict(self._slices)
+        new._slices[(None, None)] = np.arange(len(df))
+        for key, rows in _slice_rows(df.iloc[n_old:], offset=n_old).items():
+            new._slices[key] = np.concatenate([self._slices.get(key, _EMPTY), rows])
+
+        new._models = {}
+        with self._lock:
+            models = dict(self._models)
+        for key, model in models.items():
+            rows = new._slices[key]
+            model = model.updated(new._X, changed[np.isin(changed, rows)], rows[rows >= n_old])
+            if model is not None:
+                new._models[key] = model
+        new._lock = threading.Lock()
+        return new
+
+    def similar(self, positions, k=3, type_=None, diet='Both', exclude_self=True):
+        """Nearest items to each row in ``positions`` within the constraint slice.
+
+        Returns an ``(len(positions), k)`` array of row positions, closest
+        first.  Slots stay ``MISSING`` only when the slice itself holds fewer
+        than ``k`` candidates.
+        """
+        positions = np.atleast_1d(np.asarray(positions, dtype=np.intp))
+        return self.similar_to_features(self._X[positions], k, type_, diet,
+                                        exclude=positions if exclude_self else None)
+
+    def similar_to_features(self, X, k=3, type_=None, diet='Both', exclude=None):
+        """Like ``similar`` for already-scaled feature rows; ``exclude[i]`` is dropped from row i."""
+        X = np.atleast_2d(X)
+        out = np.full((len(X), k), MISSING, dtype=np.intp)
+        key = (type_, diet_food_type(diet))
+        rows = self._slices.get(key)
+        if rows is None or not len(rows) or not len(X):
+            return out
+
+        extra = 0 if exclude is None else 1
+        n = min(k + extra, len(rows))
+        found = self._model(key).kneighbors(X, n)
+        if exclude is not None:
+            keep = found != np.asarray(exclude)[:, None]
+            # Drop the query item itself; if it was not returned (ties at
+            # distance 0), drop the furthest candidate instead
+            keep[keep.all(axis=1), -1] = False
+            found = found[keep].reshape(len(X), n - 1)
+        width = min(k, found.shape[1])
+        out[:, :width] = found[:, :width]
+        return out
+
+    def neighbors_of(self, position, k=3, type_=None, diet='Both', exclude_self=True):
+        """Valid neighbour positions of a single row."""
+        row = self.similar([position], k, type_, diet, exclude_self)[0]
+        return row[row != MISSING]
+
+    def precompute(self, k=5, same_type=True, same_diet=True):
+        """``(n_items, k)`` neighbours of every item within its own Type / Food_Type slice."""
+        out = np.full((len(self._X), k), MISSING, dtype=np.intp)
+        for key, rows in self._slices.items():
+            type_, food_type = key
+            if (type_ is None) == same_type or (food_type is None) == same_diet:
+                continue
+            diet = 'Both' if food_type is None else food_type
+            out[rows] = self.similar(rows, k, type_, diet)
+        return out
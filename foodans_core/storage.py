@@ -0,0 +1,132 @@
+"""Typed columnar storage for the menu data.
+
+``python -m foodans_core.convert [csv] [out]`` converts the CSV into a Parquet
+file with dictionary-encoded (categorical) string columns and compact integer
+types.  The file records the SHA-1 of the CSV it came from; ``load_data``
+reads it only while that still matches the CSV.  The CSV stays the fallback
+source, parsed with the same dtypes so both paths produce identical frames.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+# Low-cardinality string columns, stored as dictionaries instead of Python objects
+CATEGORICAL_COLUMNS = ['Vendor_ID', 'Name', 'Type', 'Area', 'City', 'Item_Name', 'Category', 'Food_Type']
+
+NUMERIC_DTYPES = {
+    'Avg_Rating': 'float64',
+    'Total_Rating': 'int32',
+    'Item_ID': 'int32',
+    'Price': 'int32',
+    'Total_Order': 'int64',
+}
+
+# Columns that are exact copies of another column in the source CSV
+DUPLICATE_COLUMNS = {'Avg_Rating.1': 'Avg_Rating'}
+
+COLUMNAR_SUFFIX = '.parquet'
+
+# Parquet schema metadata key holding the source CSV's digest
+SOURCE_DIGEST_KEY = b'foodans.source_sha1'
+
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def columnar_path(csv_path):
+    """Where the converted file for ``csv_path`` lives."""
+    return os.path.splitext(csv_path)[0] + COLUMNAR_SUFFIX
+
+
+def compact(values, dtype):
+    """``values`` as ``dtype`` if that loses nothing (e.g. no 49.5 -> 49), otherwise as float64."""
+    values = np.asarray(values)
+    if np.dtype(dtype).kind not in 'iu' or values.dtype == dtype:
+        return values.astype(dtype)
+    with np.errstate(invalid='ignore', over='ignore'):
+        cast = values.astype(dtype)
+    return cast if np.array_equal(cast, values) else values.astype('float64')
+
+
+def normalize(df):
+    """Apply the compact dtypes and drop redundant columns (rows with NaNs are left alone)."""
+    df = df.copy()
+    for col, source in DUPLICATE_COLUMNS.items():
+        if col in df and source in df and df[col].equals(df[source]):
+            df = df.drop(columns=col)
+    for col in CATEGORICAL_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('category')
+    for col, dtype in NUMERIC_DTYPES.items():
+        # NaNs are dropped later by build_data, so only cast complete columns
+        if col in df and not df[col].isna().any():
+            df[col] = compact(df[col], dtype)
+    return df
+
+
+def read_csv(path):
+    return normalize(pd.read_csv(path, dtype={col: 'category' for col in CATEGORICAL_COLUMNS}))
+
+
+def read_columnar(path):
+    return pd.read_parquet(path)
+
+
+def has_columnar_support():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def source_digest(columnar):
+    """Digest of the CSV a columnar file was converted from, or None if it is not recorded."""
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(columnar).metadata or {}
+    digest = metadata.get(SOURCE_DIGEST_KEY)
+    return digest.decode() if digest else None
+
+
+def pick_source(csv_path, csv_digest):
+    """The file ``load_data`` should read: the columnar copy unless it is stale or unreadable.
+
+    ``csv_digest`` is ``file_digest(csv_path)``, or None when the CSV is absent.
+    """
+    columnar = columnar_path(csv_path)
+    if not os.path.exists(columnar) or not has_columnar_support():
+        return csv_path
+    if csv_digest is not None and source_digest(columnar) != csv_digest:
+        # Stale conversion: the CSV was edited afterwards
+        return csv_path
+    return columnar
+
+
+def read_frame(path):
+    if path.endswith(COLUMNAR_SUFFIX):
+        return read_columnar(path)
+    return read_csv(path)
+
+
+def convert(csv_path, out_path=None):
+    """Write the typed columnar copy of ``csv_path`` and return its path."""
+    if not has_columnar_support():
+        raise RuntimeError("Converting to Parquet needs pyarrow (pip install pyarrow)")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    out_path = out_path or columnar_path(csv_path)
+    table = pa.Table.from_pandas(read_csv(csv_path), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_DIGEST_KEY] = file_digest(csv_path).encode()
+    pq.write_table(table.replace_schema_metadata(metadata), out_path, compression='zstd')
+    return out_path
@@ -0,0 +1,108 @@
+"""Synthetic large-city menus in the schema of ``modified_madurai_food_shops.csv``.
+
+Items, categories, diet types and base prices are sampled from the bundled
+Madurai menu so the per-type mix stays realistic; vendors, areas, ratings and
+order counts are generated at whatever scale is asked for.
+
+Usage: ``python -m foodans_core.synth --rows 1000000 --out big_menu.csv``
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from foodans_core.data import DATA_PATH
+
+COLUMNS = ['Vendor_ID', 'Name', 'Type', 'Area', 'City', 'Avg_Rating', 'Total_Rating', 'Item_ID',
+           'Item_Name', 'Category', 'Price', 'Food_Type', 'Avg_Rating.1', 'Total_Order']
+
+ITEMS_PER_VENDOR = (6, 18)
+
+
+def _menu_template(template_path):
+    df = pd.read_csv(template_path).dropna()
+    return (df.groupby(['Type', 'Item_Name', 'Category', 'Food_Type'], observed=True)['Price']
+              .median().reset_index())
+
+
+def generate(n_rows, seed=0, n_areas=None, template_path=DATA_PATH):
+    """Return a synthetic menu DataFrame with about ``n_rows`` rows."""
+    rng = np.random.default_rng(seed)
+    template = _menu_template(template_path)
+    real_areas = sorted(pd.read_csv(template_path, usecols=['Area'])['Area'].dropna().unique())
+    if n_areas is None:
+        # Bigger menus cover more of the city
+        n_areas = max(len(real_areas), int(np.sqrt(n_rows) / 4))
+    areas = np.array(real_areas + [f"Ward {i}" for i in range(len(real_areas) + 1, n_areas + 1)])[:n_areas]
+    types = np.array(sorted(template['Type'].unique()))
+    type_of_template = template['Type'].to_numpy()
+    # A vendor lists each dish at most once, so no more rows than its type has dishes
+    menu_size = np.array([np.count_nonzero(type_of_template == t) for t in types])
+
+    # Vendors, their types and how many menu rows each one gets
+    n_vendors = n_rows // min(ITEMS_PER_VENDOR[0], menu_size.min()) + 1
+    vendor_type = rng.integers(0, len(types), n_vendors)
+    counts = np.minimum(rng.integers(ITEMS_PER_VENDOR[0], ITEMS_PER_VENDOR[1] + 1, n_vendors),
+                        menu_size[vendor_type])
+    ends = np.cumsum(counts)
+    n_vendors = int(np.searchsorted(ends, n_rows)) + 1
+    vendor_type, counts = vendor_type[:n_vendors], counts[:n_vendors]
+    counts[-1] -= ends[n_vendors - 1] - n_rows
+
+    vendor_area = rng.integers(0, n_areas, n_vendors)
+    vendor_rating = np.round(rng.uniform(3.5, 4.9, n_vendors), 1)
+    vendor_total_rating = rng.integers(100, 5000, n_vendors)
+
+    vendor = np.repeat(np.arange(n_vendors), counts)
+    row_type = vendor_type[vendor]
+
+    # Each vendor's dishes: the first ``count`` of a random permutation of its type's template items
+    template_row = np.empty(n_rows, dtype=np.intp)
+    for t, type_name in enumerate(types):
+        choices = np.flatnonzero(type_of_template == type_name)
+        vendors = np.flatnonzero(vendor_type == t)
+        shuffled = np.argsort(rng.random((len(vendors), len(choices))), axis=1)
+        taken = np.arange(len(choices)) < counts[vendors][:, None]
+        template_row[row_type == t] = choices[shuffled[taken]]
+    items = template.iloc[template_row].reset_index(drop=True)
+
+    price = np.maximum(5, np.round(items['Price'].to_numpy() * rng.uniform(0.8, 1.25, n_rows) / 5) * 5)
+    orders = np.clip(rng.lognormal(8, 0.9, n_rows), 100, 20000).astype(np.int64)
+
+    vendor_ids = np.char.add('V', np.char.zfill(np.arange(1, n_vendors + 1).astype(str), 7))
+    vendor_names = np.char.add(np.char.add(types[vendor_type].astype(str), ' Spot #'),
+                               np.arange(1, n_vendors + 1).astype(str))
+    df = pd.DataFrame({
+        'Vendor_ID': vendor_ids[vendor],
+        'Name': vendor_names[vendor],
+        'Type': types[row_type],
+        'Area': areas[vendor_area[vendor]],
+        'City': 'Madurai',
+        'Avg_Rating': vendor_rating[vendor],
+        'Total_Rating': vendor_total_rating[vendor],
+        'Item_ID': np.arange(100001, 100001 + n_rows),
+        'Item_Name': items['Item_Name'].to_numpy(),
+        'Category': items['Category'].to_numpy(),
+        'Price': price.astype(np.int64),
+        'Food_Type': items['Food_Type'].to_numpy(),
+        'Avg_Rating.1': vendor_rating[vendor],
+        'Total_Order': orders,
+    })
+    return df[COLUMNS]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic menu CSV.")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--areas', type=int, default=None, help="number of areas (default scales with --rows)")
+    args = parser.parse_args(argv)
+    df = generate(args.rows, seed=args.seed, n_areas=args.areas)
+    df.to_csv(args.out, index=False)
+    print(f"Wrote {len(df)} rows, {df['Name'].nunique()} vendors, {df['Area'].nunique()} areas to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
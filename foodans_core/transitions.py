@@ -0,0 +1,106 @@
+"""Precomputed "What's Next?" suggestions.
+
+For every (category, area, diet) the table holds the top next-meal rows,
+built once per data version: for each type that follows ``category`` (in
+transition-map order) the best ``per_type`` items in the area, diet-filtered
+*before* truncation, falling back to the best items city-wide when the area
+has none, then de-duplicated by dish and cut to ``limit``.  Section 4 is then
+a dict lookup into one flat int32 array.
+
+The transition map defaults to ``DEFAULT_TRANSITIONS``; point the
+``FOODANS_TRANSITIONS`` environment variable (or a ``transitions.json`` next
+to the data file) at a JSON object of ``{"Type": ["Next Type", ...]}`` to
+change it; the map is read when the data is (re)loaded.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from foodans_core.index import DIET_FILTERS
+
+DEFAULT_TRANSITIONS = {
+    "Tiffin Center": ["Tea Shop", "Lunch Center", "Fast Food"],
+    "Fast Food": ["Tea Shop", "Café"],
+    "Lunch Center": ["Café", "Tea Shop", "Fast Food"],
+    "Tea Shop": ["Fast Food", "Café", "Lunch Center"],
+    "Café": ["Tea Shop", "Tiffin Center", "Lunch Center"],
+}
+
+TRANSITIONS_ENV = 'FOODANS_TRANSITIONS'
+TRANSITIONS_FILE = 'transitions.json'
+
+_EMPTY = np.empty(0, dtype=np.int32)
+
+
+def load_transitions(data_path=None):
+    """The configured transition map: $FOODANS_TRANSITIONS, then transitions.json, then the default."""
+    candidates = [os.environ.get(TRANSITIONS_ENV)]
+    if data_path:
+        candidates.append(os.path.join(os.path.dirname(os.path.abspath(data_path)), TRANSITIONS_FILE))
+    for path in candidates:
+        if path and os.path.exists(path):
+            with open(path) as f:
+                transitions = json.load(f)
+            if not isinstance(transitions, dict) or not all(isinstance(v, list) for v in transitions.values()):
+                raise ValueError(f"{path}: expected a JSON object mapping a type to a list of next types")
+            return transitions
+    return DEFAULT_TRANSITIONS
+
+
+class TransitionTable:
+    """Top next-meal row positions for every (category, area, diet)."""
+
+    def __init__(self, df, index, transitions=DEFAULT_TRANSITIONS, per_type=3, limit=3):
+        self.transitions = transitions
+        self.per_type = per_type
+        self.limit = limit
+        dishes = pd.factorize(df['Item_Name'])[0]
+
+        # City-wide fallback per (next type, diet) is shared by every area
+        fallback = {}
+        keys, chunks, offsets = {}, [], [0]
+        for category, next_types in transitions.items():
+            for area in index.areas:
+                for diet in DIET_FILTERS:
+                    picks = []
+                    for next_type in next_types:
+                        rows = index.top(area=area, type_=next_type, diet=diet, k=per_type)
+                        if not len(rows):
+                            if (next_type, diet) not in fallback:
+                                fallback[(next_type, diet)] = index.top(type_=next_type, diet=diet, k=per_type)
+                            rows = fallback[(next_type, diet)]
+                        picks.append(rows)
+                    rows = self._unique_dishes(np.concatenate(picks) if picks else _EMPTY, dishes)
+                    keys[(category, area, diet)] = len(chunks)
+                    chunks.append(rows)
+                    offsets.append(offsets[-1] + len(rows))
+        self._keys = keys
+        self._rows = np.concatenate(chunks).astype(np.int32) if chunks else _EMPTY
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+
+    def _unique_dishes(self, rows, dishes):
+        _, first = np.unique(dishes[rows], return_index=True)
+        return rows[np.sort(first)][:self.limit]
+
+    def covers(self, category):
+        return category in self.transitions
+
+    def get(self, category, area, diet='Both'):
+        """Row positions to suggest after ``category`` in ``area`` (best first)."""
+        i = self._keys.get((category, area, diet))
+        if i is None:
+            return _EMPTY
+        return self._rows[self._offsets[i]:self._offsets[i + 1]]
+
+    def to_frame(self):
+        """The whole table as (category, area, diet, rank, row) records, for batch joins."""
+        counts = np.diff(self._offsets)
+        keys = list(self._keys)
+        key_idx = np.repeat(np.arange(len(keys)), counts)
+        frame = pd.DataFrame(keys, columns=['category', 'area', 'diet']).iloc[key_idx].reset_index(drop=True)
+        frame['rank'] = np.arange(len(self._rows)) - np.repeat(self._offsets[:-1], counts)
+        frame['row'] = self._rows
+        return frame
@@ -0,0 +1,248 @@
+"""Materialized per-vendor aggregates.
+
+The vendor sections used to re-mask the frame once per vendor and re-sort it
+for every top-N list.  ``VendorSummary`` does all of that in a handful of
+grouped passes, so rendering a vendor is a lookup regardless of how many
+vendors an area has.  Each piece (one diet filter's stats, top-N lists for one
+scope, ...) is built the first time it is asked for, so loading the data or
+rescoring it does not pay for diet filters and scopes nobody has opened yet.  Per-vendor row
+lists are kept CSR-style (one flat array plus offsets) so building them costs
+a few array sorts rather than Python work per vendor.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from foodans_core import metrics
+from foodans_core.index import DIET_FILTERS, SORT_KEYS, label_codes
+
+# Longest top-N list any section shows
+TOP_N = 10
+
+_EMPTY = np.empty(0, dtype=np.intp)
+
+
+class GroupedRows:
+    """Row positions per group key: ``rows[offsets[g]:offsets[g + 1]]`` for group ``g``."""
+
+    __slots__ = ('ids', 'rows', 'offsets', 'patch')
+
+    def __init__(self, ids, rows, offsets, patch=None):
+        self.ids = ids
+        self.rows = rows
+        self.offsets = offsets
+        self.patch = patch  # groups replaced since these arrays were built
+
+    def get(self, key):
+        if self.patch is not None and key in self.patch.ids:
+            return self.patch.get(key)
+        g = self.ids.get(key)
+        if g is None:
+            return _EMPTY
+        return self.rows[self.offsets[g]:self.offsets[g + 1]]
+
+    def replaced(self, other):
+        """A copy with every group of ``other`` taking the place of the same key here.
+
+        Replacements collect in a patch that is folded into the arrays once it
+        holds an eighth as many groups, so a small delta costs a small patch.
+        """
+        patch = other if self.patch is None else self.patch._merged(other)
+        if 8 * len(patch.ids) < len(self.ids):
+            return GroupedRows(self.ids, self.rows, self.offsets, patch)
+        return self._merged(patch)
+
+    def _merged(self, other):
+        kept = [(key, g) for key, g in self.ids.items() if key not in other.ids]
+        gs = np.fromiter((g for _, g in kept), dtype=np.intp, count=len(kept))
+        counts = np.concatenate([self.offsets[gs + 1] - self.offsets[gs], np.diff(other.offsets)])
+        offsets = np.zeros(len(counts) + 1, dtype=np.intp)
+        np.cumsum(counts, out=offsets[1:])
+        n_kept = offsets[len(gs)]
+        take = np.repeat(self.offsets[gs] - offsets[:len(gs)], counts[:len(gs)]) + np.arange(n_kept)
+        ids = {key: i for i, (key, _) in enumerate(kept)}
+        ids.update((key, len(kept) + g) for key, g in other.ids.items())
+        return GroupedRows(ids, np.concatenate([self.rows[take], other.rows]), offsets)
+
+
+def _group_ids(df, keys):
+    """Integer group id per row, and ``{key: id}`` (scalar keys for one column, tuples otherwise)."""
+    codes, labels = zip(*(label_codes(df[col]) for col in keys))
+    combined = codes[0].astype(np.int64)
+    for c, lab in zip(codes[1:], labels[1:]):
+        combined = combined * len(lab) + c
+    uniq, gids = np.unique(combined, return_inverse=True)
+    n_groups = len(uniq)
+    parts = []
+    for lab in reversed(labels):
+        parts.append(lab[uniq % len(lab)])
+        uniq = uniq // len(lab)
+    parts.reverse()
+    names = parts[0] if len(parts) == 1 else zip(*parts)
+    return gids, dict(zip(names, range(n_groups)))
+
+
+def _grouped(rows, gids, ids, ranked=None, n=None):
+    """``GroupedRows`` for rows labelled ``gids``, at most ``n`` per group.
+
+    ``ranked`` is an ordering of ``rows`` (best first) to keep within each
+    group; without it groups keep row order.
+    """
+    # rows come in ascending position order, so stable sorts break ties by row
+    if ranked is None:
+        order = np.argsort(gids, kind='stable')
+    else:
+        order = ranked[np.argsort(gids[ranked], kind='stable')]
+    rows, gids = rows[order], gids[order]
+    counts = np.bincount(gids, minlength=len(ids))
+    offsets = np.zeros(len(ids) + 1, dtype=np.intp)
+    np.cumsum(counts, out=offsets[1:])
+    if n is not None:
+        rows = rows[np.arange(len(rows)) - offsets[gids] < n]
+        np.cumsum(np.minimum(counts, n), out=offsets[1:])
+    return GroupedRows(ids, rows, offsets)
+
+
+def _aggregate(df, keys):
+    work = df.assign(_row=df.index.to_numpy())
+    stats = work.groupby(keys, sort=False, observed=True).agg(
+        avg_rating=('Avg_Rating', 'mean'),
+        total_orders=('Total_Order', 'sum'),
+        avg_score=('Score', 'mean'),
+        n_items=('Item_Name', 'size'),
+        first_row=('_row', 'min'),
+    )
+    return stats.sort_values('first_row')
+
+
+def _merged(stats, changed, names):
+    # Aggregates are ordered by first row, which a delta never moves
+    kept = stats[~stats.index.isin(list(names))]
+    return pd.concat([kept, changed]).sort_values('first_row') if len(kept) else changed
+
+
+class VendorSummary:
+    """Per-vendor stats and top items for one data version, each piece built on first use."""
+
+    SCOPES = {'area': ['Area', 'Name'], 'vendor': ['Name'], 'type': ['Name', 'Type']}
+
+    def __init__(self, df, top_n=TOP_N):
+        self.names = sorted(df['Name'].unique())
+        self.top_n = top_n
+        self._df = df
+        self._empty = _aggregate(df.iloc[:0], ['Area', 'Name']).droplevel('Area')
+        self._pieces = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        """Piece ``key``: ``(kind, diet)`` for kind areas/overall/rows/seen, or ``('top', diet, scope)``."""
+        piece = self._pieces.get(key)
+        metrics.cache('vendors', hit=piece is not None)
+        if piece is None:
+            with self._lock:
+                piece = self._pieces.get(key)
+                if piece is None:
+                    with metrics.timed('vendors.' + key[0]):
+                        piece = self._build(*key)
+                    self._pieces[key] = piece
+        return piece
+
+    def _build(self, kind, diet, scope=None):
+        df = self._df
+        food_type = DIET_FILTERS[diet]
+        sub = df if food_type is None else df[df['Food_Type'] == food_type]
+        rows = sub.index.to_numpy()
+        if kind == 'areas':
+            return {area: stats.droplevel('Area') for area, stats in
+                    _aggregate(sub, ['Area', 'Name']).groupby(level='Area', sort=False, observed=True)}
+        if kind == 'overall':
+            return _aggregate(sub, 'Name')
+        if kind == 'top':
+            gids, ids = _group_ids(sub, self.SCOPES[scope])
+            return {by: _grouped(rows, gids, ids, np.argsort(-sub[by].to_numpy(), kind='stable'), self.top_n)
+                    for by in SORT_KEYS}
+        if kind == 'rows':
+            return _grouped(rows, *_group_ids(sub, ['Name']))
+        # First-appearance order of each vendor's areas and types, like Series.unique()
+        seen = {}
+        for col in ('Area', 'Type'):
+            firsts = sub.drop_duplicates(['Name', col])
+            gids, ids = _group_ids(firsts, ['Name'])
+            seen[col] = (_grouped(firsts.index.to_numpy(), gids, ids), df[col])
+        return seen
+
+    def updated(self, df, names):
+        """Summary for ``df`` where only vendors ``names`` changed or were added.
+
+        Only those vendors' rows are re-aggregated, and only for the pieces
+        already built; everything else is shared with this summary or left to
+        be built from ``df`` on first use.  ``df`` must keep every existing
+        row at its position.
+        """
+        names = set(names)
+        new = VendorSummary.__new__(VendorSummary)
+        new.names = sorted(set(self.names) | names)
+        new.top_n = self.top_n
+        new._df = df
+        new._empty = self._empty
+        new._pieces = {}
+        new._lock = threading.Lock()
+        with self._lock:
+            pieces = dict(self._pieces)
+        if not pieces:
+            return new
+        part = VendorSummary(df[df['Name'].isin(names)], self.top_n)
+        for key, piece in pieces.items():
+            changed = part._get(key)
+            if key[0] == 'areas':
+                by_area = dict(piece)
+                for area, stats in changed.items():
+                    by_area[area] = _merged(by_area.get(area, self._empty), stats, names)
+                new._pieces[key] = by_area
+            elif key[0] == 'overall':
+                new._pieces[key] = _merged(piece, changed, names)
+            elif key[0] == 'top':
+                new._pieces[key] = {by: grouped.replaced(changed[by]) for by, grouped in piece.items()}
+            elif key[0] == 'rows':
+                new._pieces[key] = piece.replaced(changed)
+            else:
+                new._pieces[key] = {col: (grouped.replaced(changed[col][0]), df[col])
+                                    for col, (grouped, _) in piece.items()}
+        return new
+
+    def vendors_in_area(self, area, diet='Both'):
+        """Stats of every vendor in ``area`` (indexed by Name), in first-appearance order."""
+        return self._get(('areas', diet)).get(area, self._empty)
+
+    def top_vendors(self, area, diet='Both', k=5):
+        """Names of the ``k`` vendors in ``area`` with the best mean Score."""
+        stats = self.vendors_in_area(area, diet)
+        return stats['avg_score'].sort_values(ascending=False, kind='stable').head(k).index
+
+    def vendor(self, name, diet='Both'):
+        """City-wide stats for ``name`` as a dict (with ``areas``/``types``), or None if it has no items for ``diet``."""
+        overall = self._get(('overall', diet))
+        if name not in overall.index:
+            return None
+        stats = overall.loc[[name]].to_dict('records')[0]
+        for col, (grouped, values) in self._get(('seen', diet)).items():
+            stats[col.lower() + 's'] = tuple(values.iloc[grouped.get(name)])
+        return stats
+
+    def top_items(self, name, diet='Both', area=None, type_=None, by='Total_Order', k=5):
+        """Row positions of the vendor's best ``k`` items, optionally within one area or type."""
+        if k > self.top_n:
+            raise ValueError(f"VendorSummary keeps at most {self.top_n} items per vendor")
+        if area is not None:
+            rows = self._get(('top', diet, 'area'))[by].get((area, name))
+        elif type_ is not None:
+            rows = self._get(('top', diet, 'type'))[by].get((name, type_))
+        else:
+            rows = self._get(('top', diet, 'vendor'))[by].get(name)
+        return rows[:k]
+
+    def rows(self, name, diet='Both'):
+        """All row positions of vendor ``name`` for ``diet``."""
+        return self._get(('rows', diet)).get(name)
@@ -0,0 +1,15 @@
+import pytest
+
+from foodans_core import build_data, storage
+from foodans_core.data import DATA_PATH
+
+
+@pytest.fixture(scope='session')
+def menu():
+    """The bundled menu, typed like ``load_data`` reads it."""
+    return storage.read_csv(DATA_PATH)
+
+
+@pytest.fixture(scope='session')
+def data(menu):
+    return build_data(menu)
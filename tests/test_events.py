@@ -0,0 +1,69 @@
+"""``EventStore`` order counts across flushes and compaction."""
+
+import pytest
+
+from foodans_core.events import EventStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EventStore(str(tmp_path / 'events.db'))
+    yield store
+    store.close()
+
+
+def _order(store, *rows):
+    for vendor, item in rows:
+        store.order(vendor, item, 'Anna Nagar')
+    assert store.flush(timeout=5)
+
+
+def _counts(counts):
+    return {(name, item): n for name, item, _, n in counts.itertuples(index=False)}
+
+
+def test_record_flush_counts(store):
+    _order(store, ('A', 'Dosa'), ('A', 'Dosa'), ('B', 'Tea'))
+    store.feedback(5, 'good')
+    assert store.flush(timeout=5)
+    counts = store.order_counts()
+    assert _counts(counts) == {('A', 'Dosa'): 2, ('B', 'Tea'): 1}
+    assert counts.attrs['last_id'] == store.events('order')['id'].max()
+    assert len(store.events('feedback')) == 1
+
+
+def test_counts_after_watermark(store):
+    _order(store, ('A', 'Dosa'))
+    watermark = store.order_counts().attrs['last_id']
+    _order(store, ('A', 'Dosa'), ('B', 'Tea'))
+    counts = store.order_counts(after_id=watermark)
+    assert _counts(counts) == {('A', 'Dosa'): 1, ('B', 'Tea'): 1}
+    assert not len(store.order_counts(after_id=counts.attrs['last_id']))
+
+
+def test_compaction_past_watermark(store):
+    _order(store, ('A', 'Dosa'))
+    watermark = store.order_counts().attrs['last_id']
+    _order(store, ('B', 'Tea'))
+    assert store.compact() == 2
+    # Orders after the watermark were folded away, so they can no longer be told apart
+    assert store.order_counts(after_id=watermark) is None
+    assert not len(store.order_counts(after_id=store.order_counts().attrs['last_id']))
+
+
+def test_ids_not_reused_after_compaction(store):
+    _order(store, ('A', 'Dosa'), ('B', 'Tea'))
+    through = store.order_counts().attrs['last_id']
+    store.compact()
+    assert not len(store.events('order'))
+    _order(store, ('C', 'Vada'))
+    assert store.events('order')['id'].min() > through
+    assert _counts(store.order_counts(after_id=through)) == {('C', 'Vada'): 1}
+
+
+def test_full_counts_are_compacted_plus_raw(store):
+    _order(store, ('A', 'Dosa'), ('A', 'Dosa'), ('B', 'Tea'))
+    store.compact()
+    _order(store, ('A', 'Dosa'), ('C', 'Vada'))
+    assert _counts(store.order_counts()) == {('A', 'Dosa'): 3, ('B', 'Tea'): 1, ('C', 'Vada'): 1}
+    assert store.order_counts().attrs['last_id'] == store.events('order')['id'].max()
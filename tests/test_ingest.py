@@ -0,0 +1,236 @@
+"""``apply_delta`` must give the same answers as rebuilding from the updated frame."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from foodans_core import build_data, load_data, search, similarity, storage, update_data
+from foodans_core.data import DATA_PATH, KEYS
+from foodans_core.ingest import apply_delta
+from foodans_core.similarity import MISSING, feature_matrix
+from foodans_core.vendors import GroupedRows
+
+DIETS = ['Both', 'Veg', 'Non-Veg']
+
+QUERIES = ['biryani', 'biriyani', 'bir', 'tea', 'cofee', 'anand', 'dosa', 'new dish', 'vendor x', 'brand new']
+
+
+@pytest.fixture
+def warm(data):
+    """``data`` with every similarity sub-index, vendor piece and the search index built, so deltas patch them."""
+    for type_ in [None] + data.index.types:
+        for diet in DIETS:
+            data.similar.similar([0], 3, type_, diet)
+    name, area, type_ = data.df[['Name', 'Area', 'Type']].iloc[0]
+    for diet in DIETS:
+        data.vendors.vendor(name, diet)
+        data.vendors.rows(name, diet)
+        for scope in [{'area': area}, {'type_': type_}, {}]:
+            data.vendors.top_items(name, diet, **scope)
+    data.search.search(name)
+    return data
+
+
+def _rows_of(df, names):
+    return df[df['Name'].isin(names)]
+
+
+def _orders(df, rng):
+    # Two vendors only, so the vendor summary patches instead of merging
+    rows = _rows_of(df, df['Name'].unique()[:2])
+    rows = rows[rows.index != df['Total_Order'].idxmax()]
+    return {'orders': rows[KEYS].assign(orders=rng.integers(1, 5, len(rows)))}
+
+
+def _prices(df, rng):
+    rows = df.iloc[rng.choice(len(df), 30, replace=False)]
+    prices = rng.integers(10, 300, len(rows)).astype(float)
+    prices[0] += 0.5
+    return {'prices': rows[KEYS].assign(Price=prices)}
+
+
+def _new_rows(df, rng):
+    new = df.iloc[:15].drop(columns='Score').astype({col: str for col in storage.CATEGORICAL_COLUMNS})
+    new['Name'] = ['New Vendor X'] * 8 + [str(df['Name'].iloc[100])] * 7
+    new['Area'] = ['Brand New Area'] * 5 + list(df['Area'].iloc[200:210].astype(str))
+    new['Item_Name'] = [f'New Dish {i}' for i in range(15)]
+    new['Price'] = rng.integers(10, 200, 15)
+    return {'new_rows': new}
+
+
+def _rescore(df, rng):
+    row = df.iloc[[int(df['Total_Order'].idxmin())]]
+    return {'orders': row[KEYS].assign(orders=int(df['Total_Order'].max()) * 2)}
+
+
+def _mixed(df, rng):
+    orders = df.iloc[rng.choice(len(df), 200, replace=False)]
+    orders = orders[orders.index != df['Total_Order'].idxmax()]
+    return {'orders': orders[KEYS].assign(orders=1), **_prices(df, rng), **_new_rows(df, rng)}
+
+
+DELTAS = {'orders': _orders, 'prices': _prices, 'new_rows': _new_rows, 'rescore': _rescore, 'mixed': _mixed}
+
+
+def assert_same_as_rebuild(d):
+    ref = build_data(d.df.drop(columns='Score'))
+    assert np.allclose(d.df['Score'], ref.df['Score'])
+
+    index, ref_index = d.index, ref.index
+    assert (index.areas, index.types) == (ref_index.areas, ref_index.types)
+    for area in [None] + index.areas:
+        for type_ in [None] + index.types:
+            for diet in DIETS:
+                assert index.count(area, type_, diet) == ref_index.count(area, type_, diet)
+                for by in ['Score', 'Total_Order', None]:
+                    for price in [None, (0, 100)]:
+                        got = index.top(area, type_, diet, price=price, rating=(3.5, 5), k=7, by=by)
+                        want = ref_index.top(area, type_, diet, price=price, rating=(3.5, 5), k=7, by=by)
+                        assert np.array_equal(got, want), (area, type_, diet, by, price)
+
+    vendors, ref_vendors = d.vendors, ref.vendors
+    assert vendors.names == ref_vendors.names
+    for diet in DIETS:
+        for area in index.areas:
+            got, want = vendors.vendors_in_area(area, diet), ref_vendors.vendors_in_area(area, diet)
+            # Merging in a new vendor turns the categorical Name index into a plain one
+            assert list(got.index) == list(want.index)
+            pd.testing.assert_frame_equal(got.reset_index(drop=True), want.reset_index(drop=True))
+            assert list(vendors.top_vendors(area, diet)) == list(ref_vendors.top_vendors(area, diet))
+        for name in vendors.names:
+            assert vendors.vendor(name, diet) == pytest.approx(ref_vendors.vendor(name, diet)), name
+            assert np.array_equal(vendors.rows(name, diet), ref_vendors.rows(name, diet))
+            for by in ['Score', 'Total_Order']:
+                assert np.array_equal(vendors.top_items(name, diet, by=by, k=10),
+                                      ref_vendors.top_items(name, diet, by=by, k=10))
+                for type_ in index.types:
+                    assert np.array_equal(vendors.top_items(name, diet, type_=type_, by=by),
+                                          ref_vendors.top_items(name, diet, type_=type_, by=by))
+
+    assert d.transitions.to_frame().equals(ref.transitions.to_frame())
+
+    for query in QUERIES:
+        for diet in DIETS:
+            assert np.array_equal(d.search.search(query, 10, diet), ref.search.search(query, 10, diet)), query
+    assert np.array_equal(d.search._by_score, ref.search._by_score)
+
+    assert_nearest(d)
+
+
+def assert_nearest(d):
+    """Every similarity answer is a true nearest neighbour in the engine's (frozen) scaling."""
+    X = d.similar.transform(feature_matrix(d.df))
+    queries = np.concatenate([np.arange(0, len(d.df), 37), np.arange(len(d.df) - 10, len(d.df))])
+    for type_ in [None] + d.index.types:
+        for diet in DIETS:
+            mask = np.ones(len(d.df), dtype=bool)
+            if type_ is not None:
+                mask &= (d.df['Type'] == type_).to_numpy()
+            if diet != 'Both':
+                mask &= (d.df['Food_Type'] == diet).to_numpy()
+            candidates = np.flatnonzero(mask)
+            for q, found in zip(queries, d.similar.similar(queries, 3, type_, diet)):
+                found = found[found != MISSING]
+                dist = np.sqrt(((X[candidates] - X[q]) ** 2).sum(axis=1))
+                dist[candidates == q] = np.inf
+                got = np.sort(np.sqrt(((X[found] - X[q]) ** 2).sum(axis=1)))
+                assert np.allclose(got, np.sort(dist)[:len(got)]), (type_, diet, q)
+
+
+@pytest.mark.parametrize('kind', DELTAS)
+def test_delta_matches_rebuild(warm, kind, monkeypatch):
+    rng = np.random.default_rng(1)
+    d = apply_delta(warm, **DELTAS[kind](warm.df, rng))
+    assert_same_as_rebuild(d)
+    # The ranked scan over the whole Score order, not just the gathered rows
+    monkeypatch.setattr(search, 'GATHER_LIMIT', 0)
+    assert_same_as_rebuild(d)
+
+
+def test_delta_before_first_use(menu):
+    d = build_data(menu)
+    d = apply_delta(d, **_mixed(d.df, np.random.default_rng(5)))
+    assert not d.vendors._pieces and not d.search._ready
+    assert_same_as_rebuild(d)
+
+
+def test_small_deltas_patch_then_fold(warm):
+    rng = np.random.default_rng(2)
+    d = apply_delta(warm, **_orders(warm.df, rng))
+    assert d.vendors._pieces[('rows', 'Both')].patch is not None
+    assert not any(len(model.extra) for model in d.similar._models.values())
+    d = apply_delta(d, **_prices(d.df, rng))
+    assert any(len(model.extra) for model in d.similar._models.values())
+    for names in np.array_split(d.df['Name'].unique(), 10):
+        rows = _rows_of(d.df, names)
+        # Leaving the top seller alone keeps the max, so nothing is rescored
+        rows = rows[rows.index != d.df['Total_Order'].idxmax()]
+        d = apply_delta(d, orders=rows[KEYS].assign(orders=1))
+    assert d.vendors._pieces[('rows', 'Both')].patch is None
+    assert_same_as_rebuild(d)
+
+
+def test_similarity_refits_past_delta_limit(warm, monkeypatch):
+    monkeypatch.setattr(similarity, 'DELTA_LIMIT', 8)
+    monkeypatch.setattr(similarity, 'DELTA_FRACTION', 0.0)
+    rng = np.random.default_rng(3)
+    d = apply_delta(warm, **_prices(warm.df, rng))
+    assert (None, None) not in d.similar._models
+    assert_nearest(d)
+
+
+def test_fractional_price_is_kept(data):
+    row = data.df.iloc[[0]][KEYS]
+    d = apply_delta(data, prices=row.assign(Price=49.5))
+    assert d.df['Price'].iloc[0] == 49.5
+    d = apply_delta(data, prices=row.assign(Price=55))
+    assert d.df['Price'].dtype == data.df['Price'].dtype
+
+
+def test_repeated_keys_are_rejected(data):
+    new = _new_rows(data.df, np.random.default_rng(4))['new_rows']
+    with pytest.raises(ValueError, match='repeat'):
+        apply_delta(data, new_rows=pd.concat([new, new.iloc[:1]]))
+    with pytest.raises(ValueError, match='already on the menu'):
+        apply_delta(data, new_rows=data.df.iloc[:1].drop(columns='Score'))
+
+
+def test_load_drops_repeated_keys(menu):
+    orders = menu.iloc[[0]][KEYS].astype(str).assign(orders=5)
+    d = build_data(pd.concat([menu, menu.iloc[:3]], ignore_index=True), orders=orders)
+    assert len(d.df) == len(menu.dropna())
+    assert d.df['Total_Order'].iloc[0] == menu['Total_Order'].iloc[0] + 5
+
+
+def test_grouped_rows_replaced():
+    def grouped(groups):
+        rows = [np.asarray(r, dtype=np.intp) for r in groups.values()]
+        offsets = np.zeros(len(rows) + 1, dtype=np.intp)
+        np.cumsum([len(r) for r in rows], out=offsets[1:])
+        return GroupedRows({key: g for g, key in enumerate(groups)}, np.concatenate(rows), offsets)
+
+    want = {key: [3 * i, 3 * i + 1] for i, key in enumerate('abcdefghijklmnopqrstuvwxyz')}
+    rows = grouped(want)
+    for batch in [{'c': [100]}, {'c': [101, 102], 'zz': [103]}, {'a': [104]}, dict.fromkeys('klmnopq', [105])]:
+        rows = rows.replaced(grouped(batch))
+        want.update(batch)
+        for key, expected in want.items():
+            assert list(rows.get(key)) == expected, key
+        assert not len(rows.get('missing'))
+    assert rows.patch is None  # the last batch folded the patch into the arrays
+
+
+def test_update_needs_a_current_snapshot(tmp_path):
+    path = str(tmp_path / 'menu.csv')
+    with open(DATA_PATH, 'rb') as src, open(path, 'wb') as dst:
+        dst.write(src.read())
+    data = load_data(path)
+    prices = data.df.iloc[[0]][KEYS].assign(Price=49)
+    assert update_data(str(tmp_path / 'missing.csv'), prices=prices) is None
+    updated = update_data(path, prices=prices)
+    assert updated is load_data(path) and updated.df['Price'].iloc[0] == 49
+    with open(path, 'ab') as f:
+        f.write(b'\n')
+    # The next load_data rebuilds (with recorded orders); update_data does not
+    assert update_data(path, prices=prices) is None
+    assert load_data(path) is not updated
@@ -0,0 +1,54 @@
+"""Every ``*_batch`` function must agree with its single-request version on every UI combination."""
+
+import pytest
+
+from foodans_core import recommend
+
+
+@pytest.fixture(scope='module')
+def requests(data):
+    return recommend.all_requests(data)
+
+
+def _by_request(table):
+    return {request: rows for request, rows in table.groupby('request', sort=False)}
+
+
+def test_top_vendors_batch(data, requests):
+    vendor_reqs, _, _ = requests
+    batch = _by_request(recommend.top_vendors_batch(data, vendor_reqs))
+    for request, req in vendor_reqs.iterrows():
+        single = recommend.top_vendors(data, req['area'], req['diet'])
+        rows = batch.get(request)
+        got = [] if rows is None else [(vendor, list(items['row'])) for (_, vendor), items in
+                                       rows.groupby(['vendor_rank', 'Name'], sort=False, observed=True)]
+        assert got == [(vendor, list(items.index)) for vendor, items in single], tuple(req)
+
+
+def test_find_food_batch(data, requests):
+    _, food_reqs, _ = requests
+    batch = _by_request(recommend.find_food_batch(data, food_reqs))
+    for request, req in food_reqs.iterrows():
+        single = recommend.find_food(data, req['area'], req['category'], req['diet'],
+                                     (req['price_min'], req['price_max']), (req['rating_min'], req['rating_max']))
+        rows = batch.get(request)
+        kinds = {} if rows is None else {kind: list(part['row']) for kind, part in rows.groupby('kind', sort=False)}
+        if single.top_item is None:
+            alternatives = [] if single.similar is None else list(single.similar.index)
+            assert 'match' not in kinds, tuple(req)
+            assert kinds.get('alternative', []) == alternatives, tuple(req)
+            continue
+        # Batch matches come in Score order, single ones grouped by vendor
+        assert sorted(kinds['match']) == sorted(single.matches.index), tuple(req)
+        assert kinds['match'][0] == single.top_item.name, tuple(req)
+        similar = rows[rows['kind'] == 'similar'].sort_values('rank', kind='stable')
+        assert list(similar['row']) == list(single.similar.index), tuple(req)
+
+
+def test_next_meals_batch(data, requests):
+    _, _, next_reqs = requests
+    batch = _by_request(recommend.next_meals_batch(data, next_reqs))
+    for request, req in next_reqs.iterrows():
+        single = recommend.next_meals(data, req['category'], req['area'], req['diet'])
+        rows = batch.get(request)
+        assert ([] if rows is None else list(rows['row'])) == list(single.index), tuple(req)
@@ -0,0 +1,49 @@
+"""Search ranking, and the gathered, boosted and scanned paths agreeing with each other."""
+
+import numpy as np
+import pytest
+
+from foodans_core import recommend, search
+
+QUERIES = ['biryani', 'biriyani', 'bir', 'tea', 'cofee', 'dosa', 'chicken', 'masala dosa', 'street hub',
+           'tandoori chicken', 'madurai', 'veg', 'zz']
+
+
+def test_exact_vendor_name_ranks_first(data):
+    for name in data.vendors.names:
+        assert recommend.search_vendors(data, name, k=1) == [name]
+    assert recommend.search_vendors(data, 'street tandoori hub')[0] == 'Street Tandoori Hub 🍗'
+
+
+def test_exact_dish_name_ranks_first(data):
+    for dish in data.df['Item_Name'].unique()[:40]:
+        assert data.df['Item_Name'].iloc[data.search.search(dish, k=1)[0]] == dish
+
+
+@pytest.mark.parametrize('limit', [0, 10, 100])
+def test_paths_agree(data, limit, monkeypatch):
+    queries = QUERIES + list(data.vendors.names)
+    want = {(q, diet): data.search.search(q, 10, diet) for q in queries for diet in ['Both', 'Veg', 'Non-Veg']}
+    monkeypatch.setattr(search, 'GATHER_LIMIT', limit)
+    for (q, diet), rows in want.items():
+        assert np.array_equal(data.search.search(q, 10, diet), rows), (q, diet)
+
+
+@pytest.mark.parametrize('word', ['biriyani', 'chiken', 'cofee'])
+def test_results_while_typing(data, word):
+    # Every prefix of a misspelt word still finds something
+    for n in range(1, len(word) + 1):
+        assert len(data.search.search(word[:n], 10)), word[:n]
+
+
+def test_updated_keeps_ties_in_row_order(data):
+    data.search.search('tea')  # build the index, so updated moves rows
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        score = data.df['Score'].to_numpy().copy()
+        rows = rng.choice(len(score), rng.integers(1, 100), replace=False)
+        score[rows] = rng.choice(score, len(rows))  # equal to some unchanged row's Score
+        df = data.df.assign(Score=score)
+        updated, rebuilt = data.search.updated(df, rows), search.SearchIndex(df)
+        rebuilt.search('tea')
+        assert np.array_equal(updated._by_score, rebuilt._by_score)